@@ -24,27 +24,26 @@ from shapely.geometry import shape, Point, mapping
 from scipy import stats
 from scipy import spatial
 from scipy import signal
+
+import trackArray
 ### scipy.stats.gaussian_kde
 
 
 def Smoothing(track, window=3):
-    track = np.array([[pt.x, pt.y] for ind, pt in np.ndenumerate(track.values)])
+    xy = trackArray.coords(track)
     try:
         def movingaverage(values, window):
             return np.convolve(values, np.repeat(1.0, window)/window, mode='same')
-        track = np.array(track)
-        track = np.vstack((track[0],track,track[-1]))
-        track[:,0] = movingaverage(track[:,0],3)
-        track[:,1] = movingaverage(track[:,1],3)
+        xy = np.vstack((xy[0],xy,xy[-1]))
+        xy[:,0] = movingaverage(xy[:,0],3)
+        xy[:,1] = movingaverage(xy[:,1],3)
         
-        track = np.array(track)
-        track = track[1:-1]
-        track = GeoSeries(map(Point, track))
-        return track
+        xy = xy[1:-1]
+        return trackArray.like(xy, track)
     except ValueError: # If track is shorter than 3 points
         print("Track too short")
         
-    return track
+    return xy
 
 
 def knn(track, k):
@@ -72,7 +71,7 @@ def centroid(cluster):
 
 
 def endPattern(track, k=10):    
-    track = np.array([[pt.x, pt.y] for ind, pt in np.ndenumerate(track.values)])
+    track = trackArray.coords(track)
     distances, indices = knn(track, k)
     
     #start centroid and end centroid according to distribution of track points
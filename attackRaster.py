@@ -25,27 +25,28 @@ from shapely.geometry import shape, Point, mapping
 from scipy import stats
 from scipy import spatial
 from scipy import signal
+
+import landUseRaster
+import layers
+import trackArray
 ### scipy.stats.gaussian_kde
 
 
 def Smoothing(track, window=3):
-    track = np.array([[pt.x, pt.y] for ind, pt in np.ndenumerate(track.values)])
+    xy = trackArray.coords(track)
     try:
         def movingaverage(values, window):
             return np.convolve(values, np.repeat(1.0, window)/window, mode='same')
-        track = np.array(track)
-        track = np.vstack((track[0],track,track[-1]))
-        track[:,0] = movingaverage(track[:,0],3)
-        track[:,1] = movingaverage(track[:,1],3)
+        xy = np.vstack((xy[0],xy,xy[-1]))
+        xy[:,0] = movingaverage(xy[:,0],3)
+        xy[:,1] = movingaverage(xy[:,1],3)
         
-        track = np.array(track)
-        track = track[1:-1]
-        track = GeoSeries(map(Point, track))
-        return track
+        xy = xy[1:-1]
+        return trackArray.like(xy, track)
     except ValueError: # If track is shorter than 3 points
         print("Track too short")
         
-    return track
+    return xy
 
 
 def knn(track, k):
@@ -55,16 +56,14 @@ def knn(track, k):
     return distances, indices
 
 
+#Share of residential land use within lag of many locations (N,2) in one call (precomputed focal fractions if available)
+def getLUProbs(locs, land, residential=60, lag=30):
+    prob = landUseRaster.loadGrid(land).classFraction(locs, lag, residential)
+    return np.where(prob > 0, prob, 0.0001)
+
+
 def getLUProb(loc, land, residential=60, lag=30):
-    loc = Point(loc)
-    bufferLoc = loc.buffer(lag)
-    stats = zonal_stats(bufferLoc, land)
-    categoryCount = zonal_stats(bufferLoc, land, categorical=True)
-    if residential in stats[0].keys():
-        prob = categoryCount[0][residential]/stats[0]['count']
-    else:
-        prob = 0.0001
-    return prob
+    return getLUProbs(np.array([loc]), land, residential, lag)[0]
 
 
 def centroid(cluster, land, residential):
@@ -79,10 +78,7 @@ def centroid(cluster, land, residential):
     
     #Joint density of spaital cluster and type
     densityCol = density(positions)  #Density into 1-D for choosing
-    densityLoc = []
-    for loc in positions.T:
-        densityLoc.append(getLUProb(loc, land, residential=60, lag=30))
-    densityLoc = np.array(densityLoc)
+    densityLoc = getLUProbs(positions.T, land, residential=60, lag=30)
         
     densityCol = densityCol*densityLoc
 ##    plotDensity(xmin, xmax, ymin, ymax, cluster, density, positions, X)
@@ -93,7 +89,7 @@ def centroid(cluster, land, residential):
 
 
 def endPattern(track, land, residential, k=5):    
-    track = np.array([[pt.x, pt.y] for ind, pt in np.ndenumerate(track.values)])
+    track = trackArray.coords(track)
     distances, indices = knn(track, k)
     
     #start centroid and end centroid according to distribution of track points
@@ -110,18 +106,19 @@ def attack(track, land, residential):
     return smoothed, start, end
 
 
-def attacking(fake):
+#Attacks an obfuscated track (in-memory layer or file, see layers.py).
+#Returns the potential home location and the smoothed (attacked) track, saved in the sink if given
+def attacking(fake, sink=None, land='landUse.tif'):
 #    obfstrack = fake
 #    layer = 'sampleLandUse.shp'
 #    land = gpd.GeoDataFrame.from_file(layer)
-    land = 'landUse.tif'
     
-    trackobf = gpd.GeoDataFrame.from_file(fake)
+    trackobf = layers.geometry(fake)
     residential = 60  # to be clarified
     
-    smoothed, start, end = attack(trackobf['geometry'], land, residential)
-    smoothed.to_file(driver = 'ESRI Shapefile', filename = 'attacked.shp')
-    return end
+    smoothed, start, end = attack(trackobf, land, residential)
+    layers.writeLayer(smoothed, 'attacked', sink)
+    return end, smoothed
     
     
 
@@ -0,0 +1,178 @@
+#-------------------------------------------------------------------------------
+# Name:        Batch crowding
+# Purpose:     Crowding, attacking and evaluating many tracks across a process pool.
+#              The land use and concentration rasters are read once into shared memory
+#              and attached read-only by the workers (no per-track raster reads), and
+#              BLAS/OpenMP threads per worker are capped to avoid oversubscription:
+#                  python batchCrowding.py Extracted landUse.tif no2small.tif [workers [cache]]
+#              writes reconstruct*.csv and preserve*.csv as run.py does. With cache, land use
+#              classes of raster pixels are kept between runs (see landUseCache.py).
+#
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+import functools
+import os
+import random
+import sys
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from affine import Affine
+
+import attackRaster
+import crowdingRaster
+import evaluationExposure
+import evaluationReconstruct
+import landUseCache
+import landUseRaster
+import otherMasking
+
+
+#Environment variables of thread pools of BLAS/OpenMP libraries (read when the libraries are loaded)
+THREAD_VARIABLES = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'NUMEXPR_NUM_THREADS',
+                    'VECLIB_MAXIMUM_THREADS', 'BLIS_NUM_THREADS')
+
+RECONSTRUCT = ['len', 'frac', 'lineSim', 'homeDis', 'majorPtgDiff', 'minorPtgDiff', 'thetaPtgDiff', 'time']
+PRESERVE = ['min', 'max', 'median', 'mean']
+
+
+#A raster band copied once into shared memory. spec describes it for attaching in other processes
+class SharedRaster(object):
+
+    def __init__(self, path, band=1):
+        grid = landUseRaster.RasterGrid.fromFile(path, band)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(grid.data.nbytes, 1))
+        data = np.ndarray(grid.data.shape, dtype=grid.data.dtype, buffer=self.shm.buf)
+        data[...] = grid.data
+        self.spec = {'name': self.shm.name, 'shape': grid.data.shape, 'dtype': grid.data.dtype.str,
+                     'transform': tuple(grid.transform)[:6], 'nodata': grid.nodata, 'path': os.path.abspath(str(path))}
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+#Attaches a shared raster (read-only) as the land use grid of its raster file in this process
+def attachRaster(spec):
+    #Workers share the resource tracker of the process that created the block, which removes it once
+    shm = shared_memory.SharedMemory(name=spec['name'])
+    data = np.ndarray(spec['shape'], dtype=np.dtype(spec['dtype']), buffer=shm.buf)
+    data.flags.writeable = False
+    grid = landUseRaster.LandUseGrid(data, Affine(*spec['transform']), spec['nodata'], spec['path']).attachFocal()
+    grid.shm = shm
+    return landUseRaster.registerGrid(grid)
+
+
+#Sets the thread pool sizes of BLAS/OpenMP libraries for processes started within the context
+@contextmanager
+def threadLimits(threads):
+    old = {name: os.environ.get(name) for name in THREAD_VARIABLES}
+    os.environ.update({name: str(threads) for name in THREAD_VARIABLES})
+    try:
+        yield
+    finally:
+        for name, value in old.items():
+            if value is None:
+                del os.environ[name]
+            else:
+                os.environ[name] = value
+
+
+_limits = None
+
+
+def _initWorker(specs, threads, store=None, cachesize=landUseCache.MAXSIZE):
+    global _limits
+    #Libraries already loaded (e.g. in forked workers) are limited at runtime
+    try:
+        from threadpoolctl import threadpool_limits
+        _limits = threadpool_limits(threads)
+    except ImportError:
+        pass
+    #Forked workers inherit the random state of the parent; each task is seeded again in _work
+    np.random.seed()
+    random.seed()
+    for i, spec in enumerate(specs):
+        grid = attachRaster(spec)
+        #Land use classes are cached for the land use raster only (the first raster)
+        if i == 0:
+            landUseCache.loadCache(grid, store=store, maxsize=cachesize)
+
+
+#Seeds the random generators of this process (np.random and random, drawn from by masking and extension) from a
+#np.random.SeedSequence, so that tasks draw independent noise whichever worker runs them
+def seedTask(seq):
+    np.random.seed(seq.generate_state(4))
+    random.seed(int(seq.generate_state(1, np.uint64)[0]))
+
+
+def _work(args):
+    work, f, seq = args
+    seedTask(seq)
+    try:
+        return f, work(f)
+    except Exception as e:
+        print('track '+str(f)+' failed: '+repr(e))
+        return f, None
+
+
+#Applies work to each track (csv file) across a process pool, with the rasters loaded once into shared memory.
+#The first of rasters is the land use raster (e.g. landUse.tif, then no2small.tif).
+#context: multiprocessing start method context (default of the platform if None).
+#store: persistent land use class store of the land use raster in the workers (see landUseCache.loadCache).
+#cachesize: number of pixels in the in-process land use class cache of each worker.
+#seed: seed of the random streams of the tracks (one np.random.SeedSequence spawned per track; None: from OS entropy)
+#Returns a list of (track, result) in the order of tracks; result is None for tracks that failed
+def batch(tracks, work, rasters=('landUse.tif',), workers=None, threads=1, chunksize=1, context=None, store=None, seed=None,
+          cachesize=landUseCache.MAXSIZE):
+    tracks = list(tracks)
+    seqs = np.random.SeedSequence(seed).spawn(len(tracks))
+    shared = [SharedRaster(path) for path in rasters]
+    try:
+        with threadLimits(threads):
+            with ProcessPoolExecutor(workers, mp_context=context, initializer=_initWorker, initargs=([s.spec for s in shared], threads, store, cachesize)) as pool:
+                return list(pool.map(_work, [(work, f, seq) for f, seq in zip(tracks, seqs)], chunksize=chunksize))
+    finally:
+        for s in shared:
+            s.close()
+
+
+#Crowds and masks one track, attacks the obfuscated tracks and evaluates them (the per track pipeline of run.py).
+#Returns the reconstruction and preservation summaries of crowding (C), Gaussian perturbation (G) and Voronoi masking (V).
+#budget: time/work budget of the extension of the track (see crowdingRaster.ExtendMimic)
+#crowd:  crowding of a track file, crowdingRaster.run by default (e.g. segmentedCrowding.run for very long tracks)
+def evaluateTrack(f, land='landUse.tif', concentration='no2small.tif', budget=None, crowd=None):
+    masked = otherMasking.run(f)
+    crowd = crowd if crowd is not None else crowdingRaster.run
+    home, speed, crowded = crowd(f, land=land, budget=budget)
+    summaries = {}
+    for name, fake in (('C', crowded['faketrack']), ('G', masked['Gaussian']), ('V', masked['Vor'])):
+        potentialHome, attacked = attackRaster.attacking(fake=fake, land=land)
+        #Reconstruction
+        reconSummary = evaluationReconstruct.evalRecon(crowded['track'], attacked, home, potentialHome)
+        reconSummary = np.append(reconSummary, speed/reconSummary[0])
+        #Preservation
+        preserveSummary = evaluationExposure.evalPres(crowded['track'], fake, concentration)
+        summaries[name] = (reconSummary.T, preserveSummary.T)
+    return summaries
+
+
+def main():
+    data_dir, land, concentration = sys.argv[1], sys.argv[2], sys.argv[3]
+    workers = int(sys.argv[4]) if len(sys.argv) > 4 else None
+    store = len(sys.argv) > 5 and sys.argv[5] == 'cache'
+    results = batch(sorted(Path(data_dir).glob('*.csv')), functools.partial(evaluateTrack, land=land, concentration=concentration), rasters=(land, concentration), workers=workers, store=store)
+    results = [summaries for f, summaries in results if summaries is not None]
+    print(str(len(results))+' tracks evaluated')
+    for name in ('C', 'G', 'V'):
+        pd.DataFrame(columns=PRESERVE, data=[s[name][1] for s in results]).to_csv('preserve'+name+'.csv', sep='\t')
+        pd.DataFrame(columns=RECONSTRUCT, data=[s[name][0] for s in results]).to_csv('reconstruct'+name+'.csv', sep='\t')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+#-------------------------------------------------------------------------------
+# Name:        Corridor statistics
+# Purpose:     Raster statistics within a corridor of radius lag around a track polyline.
+#              The corridor is rasterized directly on the raster grid from the distance of
+#              each cell centre to the polyline (no shapely buffer polygon), so categorical
+#              counts and continuous statistics for several radii come from one read.
+#              A cell belongs to the corridor if its centre lies within the radius, as in
+#              rasterstats.zonal_stats with a buffer polygon.
+#
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+from collections import OrderedDict
+
+import numpy as np
+import rasterio
+from rasterio import windows
+from rasterio.windows import Window
+
+import landUseRaster
+import trackArray
+
+
+#Statistics supported for continuous rasters
+STATS = ('min', 'max', 'mean', 'median', 'sum', 'count')
+
+
+#Reads the window of a raster (RasterGrid or raster file) covering the bounds (xmin, ymin, xmax, ymax).
+#Returns the values, their validity mask and the transform of the window
+def readWindow(raster, bounds):
+    xmin, ymin, xmax, ymax = bounds
+    if isinstance(raster, landUseRaster.RasterGrid):
+        t, (h, w) = raster.transform, raster.shape
+    else:
+        src = rasterio.open(str(raster))
+        t, h, w = src.transform, src.height, src.width
+    c0 = int(np.clip(np.floor((xmin - t.c)/t.a), 0, w))
+    c1 = int(np.clip(np.floor((xmax - t.c)/t.a) + 1, 0, w))
+    r0 = int(np.clip(np.floor((ymax - t.f)/t.e), 0, h))
+    r1 = int(np.clip(np.floor((ymin - t.f)/t.e) + 1, 0, h))
+    if isinstance(raster, landUseRaster.RasterGrid):
+        values, nodata = raster.data[r0:r1, c0:c1], raster.nodata
+    else:
+        with src:
+            values, nodata = src.read(1, window=Window(c0, r0, c1-c0, r1-r0)), src.nodata
+    return values, landUseRaster.validMask(values, nodata), windows.transform(Window(c0, r0, c1-c0, r1-r0), t)
+
+
+#Distance of every cell centre of a raster window (shape, transform) to a polyline; only computed up to maxdist
+def lineDistance(xy, shape, transform, maxdist):
+    h, w = shape
+    t = transform
+    cx = t.c + (np.arange(w) + 0.5)*t.a
+    cy = t.f + (np.arange(h) + 0.5)*t.e
+    dist = np.full(shape, np.inf)
+    segments = zip(xy[:-1], xy[1:]) if len(xy) > 1 else [(xy[0], xy[0])]
+    for a, b in segments:
+        #Cells within maxdist of the bounding box of the segment
+        c0 = max(int(np.floor((min(a[0], b[0]) - maxdist - t.c)/t.a)), 0)
+        c1 = min(int(np.floor((max(a[0], b[0]) + maxdist - t.c)/t.a)) + 1, w)
+        r0 = max(int(np.floor((max(a[1], b[1]) + maxdist - t.f)/t.e)), 0)
+        r1 = min(int(np.floor((min(a[1], b[1]) - maxdist - t.f)/t.e)) + 1, h)
+        if c0 >= c1 or r0 >= r1:
+            continue
+        X = cx[None, c0:c1] - a[0]
+        Y = cy[r0:r1, None] - a[1]
+        d = b - a
+        l2 = d[0]**2 + d[1]**2
+        s = np.clip((X*d[0] + Y*d[1])/l2, 0, 1) if l2 > 0 else 0.0
+        np.minimum(dist[r0:r1, c0:c1], np.hypot(X - s*d[0], Y - s*d[1]), out=dist[r0:r1, c0:c1])
+    return dist
+
+
+#Statistics of a raster within corridors of the given radii around a track.
+#categorical: per class pixel counts ('categories') and total pixel count ('count'),
+#otherwise the continuous statistics in stats (None where the corridor has no valid pixel).
+#Returns a dict radius -> statistics
+def corridorStats(track, raster, radii, categorical=False, stats=STATS):
+    xy = trackArray.coords(track)
+    radii = list(radii) if np.iterable(radii) else [radii]
+    rmax = max(radii)
+    bounds = (xy[:, 0].min() - rmax, xy[:, 1].min() - rmax, xy[:, 0].max() + rmax, xy[:, 1].max() + rmax)
+    values, valid, transform = readWindow(raster, bounds)
+    dist = lineDistance(xy, values.shape, transform, rmax)
+    out = {}
+    for r in radii:
+        v = values[valid & (dist <= r)]
+        if categorical:
+            classes, counts = np.unique(v, return_counts=True)
+            out[r] = {'categories': dict(zip(classes.tolist(), counts.tolist())), 'count': int(len(v))}
+            continue
+        v = v.astype(np.float64)
+        st = {'count': int(len(v))}
+        for name in stats:
+            if name == 'count':
+                continue
+            st[name] = getattr(np, name)(v).item() if len(v) else None
+        out[r] = st
+    return out
+
+
+#Valid pixels of a raster grid (RasterGrid) within distance radius of a polyline (N,2).
+#Returns the flat pixel ids (row*width + col) and the pixel values
+def corridorPixels(xy, raster, radius):
+    xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+    bounds = (xy[:, 0].min() - radius, xy[:, 1].min() - radius, xy[:, 0].max() + radius, xy[:, 1].max() + radius)
+    values, valid, transform = readWindow(raster, bounds)
+    dist = lineDistance(xy, values.shape, transform, radius)
+    rows, cols = np.nonzero(valid & (dist <= radius))
+    t = raster.transform
+    r0, c0 = int(round((transform.f - t.f)/t.e)), int(round((transform.c - t.c)/t.a))
+    return (rows + r0)*raster.shape[1] + (cols + c0), values[rows, cols]
+
+
+#Pixel counts per class within distance radius of a growing polyline (e.g. a track received point by point).
+#Each pixel is counted once, so the counts equal corridorStats(..., categorical=True) of the whole polyline.
+#maxsize: number of counted pixels remembered (the oldest are forgotten, so a pixel counted before those is counted
+#again when the polyline returns to it); None: all
+class CorridorCounts(object):
+
+    def __init__(self, raster, radius, maxsize=None):
+        self.raster = raster
+        self.radius = radius
+        self.maxsize = maxsize
+        #Counted pixel ids, oldest first
+        self.pixels = OrderedDict()
+        self.counts = {}
+        self.total = 0
+
+    #Pixels within radius of the polyline xy that are not counted yet: pixel ids and values
+    def new(self, xy):
+        ids, values = corridorPixels(xy, self.raster, self.radius)
+        keep = np.array([i not in self.pixels for i in ids.tolist()], dtype=bool)
+        return ids[keep], values[keep]
+
+    def update(self, ids, values):
+        self.pixels.update(dict.fromkeys(ids.tolist()))
+        if self.maxsize is not None:
+            while len(self.pixels) > self.maxsize:
+                self.pixels.popitem(last=False)
+        classes, n = np.unique(values, return_counts=True)
+        for c, k in zip(classes.tolist(), n.tolist()):
+            self.counts[c] = self.counts.get(c, 0) + k
+        self.total += len(ids)
+
+    #Adds the corridor of the polyline xy (a track or its new segments)
+    def extend(self, xy):
+        self.update(*self.new(xy))
+
+    #Land use distribution (class -> probability), as locTable
+    def probs(self):
+        return {c: n/self.total for c, n in self.counts.items()}
@@ -37,6 +37,17 @@ from shapely.ops import transform
 from scipy import stats
 import rtree
 
+import corridor
+import extension
+import grid
+import landUseIndex
+import landUseRaster
+import layers
+import masking
+import movement
+import reproject
+import trackArray
+
 #Spatial vector operations. These are used to implement vector algebra with shapely geometries for template masking
 def Vminus(p1, p2):  #Vector subtraction
     return Point(p1.x - p2.x, p1.y - p2.y)
@@ -50,18 +61,12 @@ def Vmult(m, p): #Multiplication of a vector with a scalar
 
 """Functions for rasterization of track"""
 
+#Rounds each point in the track based on rounding increment m. Returns the rasterized track (unique cells in track order)
+#and a lookup index from each raster cell to its original points (for picking enrichments for each point of the initial track)
 def Rasterize(track,m):
     print('Size of original track:'+str(track.size))
-    #This rounds each point in the track based on rounding increment m
-    lookup = track.apply(lambda p: (np.round(p.x/m)*m, np.round(p.y/m)*m) )
-    rt = pd.DataFrame({'points': lookup.unique()})
-    print("lookup table (for picking enrichments for each point of the initial track):")
-    lookup = lookup.apply(lambda points: Point(points))
-    print(lookup)
-
-    rt['geom'] = rt['points'].apply(Point)
-
-    rastertrack = gpd.GeoDataFrame(rt, geometry='geom')['geom']
+    xy, lookup = grid.rasterize(trackArray.coords(track), m)
+    rastertrack = gpd.GeoSeries(gpd.points_from_xy(xy[:,0], xy[:,1]), name='geom')
 
     print("rasterized track:")
     print(rastertrack)
@@ -72,43 +77,24 @@ def Rasterize(track,m):
 
 """Functions for track extension (mimick)"""
 
-#Generates a list of difference vectors for a track sequence. Also generates a corresponding set  with unique point values.
-def getV(track):
-    #Get the vector difference between all pairs of points in the track
-     V = [Vminus(track[i[0]+1], p) for i,p in np.ndenumerate(track.values) if i[0]+1 < track.size]
-     Vset =[]
-     for v in V:
-        #count = 0
-        insert = True
-        for vv in Vset:
-            if not v.equals(vv):
-                insert = True
-            else:
-                insert = False
-                break
-        if insert:
-            Vset.append(v)
-     return  V, Vset
+#Generates the movement distribution of a track sequence: the difference vectors between consecutive points
+#as integer offsets in units of the rounding increment m, the set of unique vectors and their probabilities
+def getV(track, m):
+    return movement.MoveDistr.fromTrack(track, m)
 
 #Generates a distance list for a track sequence
 def getDistances(track):
     #Returns an array of distances in a sequence of point geometries in the track
-   return [x.distance(track[i[0]+1]) for i,x in np.ndenumerate(track.values) if i[0]+1 < track.values.size]
+    return np.hypot(*np.diff(trackArray.coords(track), axis=0).T)
 
 
 #Computes a combined probability out of movement and location probablity
-def probability(v, V, end, layer, table, lag=30):
-    return moveProb(v, V)*locProb(v, end, layer, table, lag)
+def probability(v, distr, end, layer, table, lag=30):
+    return moveProb(v, distr)*locProb(v, end, layer, table, lag)
 
 #Computes a movement probability (probability that a relative vector occurs in the sequence of a track)
-def moveProb(v, V):
-    c = 0
-    #Count the number of occurrences of this movement in the track
-    for vi in V:
-        if vi.equals(v):
-        #if (vi.x == v.x) & (vi.y == v.y):
-            c+=1
-    return float(c)/float(len(V))
+def moveProb(v, distr):
+    return distr.prob(v)
 
 
 """A function for looking up Raster cell row/colum projected in RD_new, based on a WGS84 coordinate pair as input as well as a Geo raster tile"""
@@ -144,52 +130,35 @@ def generate_index(records, index_path):
 '''
 
 
-#Selects a polygon in a projected layer based on x y coordinates in WGS84
-def selectPolygonData(pn, index, datasrc):
-    global attr
-    attr = {}
-    for fid in index.intersection(pn.bounds):
-        if fid != None and fid in datasrc.keys():
-            feat = datasrc[int(fid)]
-            od =  feat['properties'].items()
-            #print od
-            for i in od:
-                if i[0]=='BG2010' :
-                    attr =i[1]
-                    break
-            #print str(attr)
-            #attr = shape(value)
-            break
-    return attr
+#Land use class (BG2010) of the parcels around many locations (N,2): the class covering most of the buffer of radius lag
+#around each location, looked up in the spatial index of the layer (built once, see landUseIndex.py); None off the layer.
+#If layer is the rasterized layer (landUseIndex.loadGrid), the modal class of the cells within lag
+def getLanduseclasses(newLocs, layer, lag):
+    if isinstance(layer, landUseRaster.LandUseGrid):
+        classes, valid = layer.modeClass(newLocs, lag)
+        return np.where(valid, classes.astype(object), None)
+    return landUseIndex.loadIndex(layer).query(newLocs, lag)
 
 
 def getLanduseclass(newLoc, layer, lag):
-    buffernewLoc = newLoc.buffer(lag)
-    with fiona.open(layer) as landuse:
-        '''
-        fname, _ = os.path.splitext(layer)
-        if os.path.exists(fname + '.dat') and os.path.exists(fname + '.idx'):
-            land_index = rtree.index.Index(fname)
-        else:
-            land_index = generate_index(datasrc, fname)
-        '''
-        land_index = rtree.index.Index()
-        # populate the spatial index
-        for fid, feature in landuse.items():
-            geometry = shape(feature['geometry'])
-            land_index.insert(fid, geometry.bounds)
-        landuseclass = selectPolygonData(buffernewLoc, land_index, landuse)
-        return landuseclass
+    return getLanduseclasses(np.array([[newLoc.x, newLoc.y]]), layer, lag)[0]
+
+
+#Land use table of a track as a class -> probability mapping (from landUseDistr, or the table frame of locTable)
+def luProbs(table):
+    if isinstance(table, dict):
+        return table
+    return dict(zip(table['land'], table['Probability']))
+
+
+#Probabilities of many land use classes in the land use table of a track
+def getLUProbs(landuseclasses, table):
+    probs = luProbs(table)
+    return np.array([probs.get(c, 0) for c in landuseclasses], dtype=np.float64)
 
 
 def getLUProb(landuseclass, table) :
-    landProb = 0
-    for index, attr in table.iterrows():
-        #print attr
-        if attr['land'] == landuseclass:
-            landProb = attr['Probability']
-            break
-    return landProb
+    return luProbs(table).get(landuseclass, 0)
 
 
 def locProb(v, end, layer, table, lag):
@@ -201,43 +170,50 @@ def locProb(v, end, layer, table, lag):
 ##            p = float(locDistr['overallProb'][V.index(vi)])
     return  p
 
+#Land use parcels of a layer (file path, GeoDataFrame or landUseIndex.LandUseIndex) as a spatial index
+def landUseIndexOf(land, persist=True):
+    if isinstance(land, gpd.GeoDataFrame):
+        return landUseIndex.LandUseIndex.fromFrame(land)
+    return landUseIndex.loadIndex(land, persist)
+
+
 #Generates a location probability for a given point based on a distribution of landuse in the track
-#Distribution table generated based upon buffer along the entire track (buffer of the route)
-def locTable(track, land, lag):
+#Distribution (class -> probability) based upon buffer along the entire track (buffer of the route):
+#the proportion of each land use type of the entire buffer, in memory
+#(or, for the rasterized layer, of the cells whose centres lie within the buffer)
+def landUseDistr(track, land, lag):
+    if isinstance(land, landUseRaster.LandUseGrid):
+        counts = corridor.CorridorCounts(land, lag)
+        counts.extend(trackArray.coords(track))
+        return counts.probs()
+    areas = landUseIndexOf(land).areas(geometry.LineString(track).buffer(lag))
+    total = sum(areas.values())
+    return {c: a/total for c, a in areas.items()} if total > 0 else {}
+
+
+#Distribution table (GeoDataFrame with the land, area and Probability of each land use type) as landUseDistr,
+#with the buffer, its intersection with the land use map and the table written to sink
+def locTable(track, land, lag, sink=None):
     #convert point into line: line is equivalent to infinite number of sampling point to query land use type
     trackLine = geometry.LineString(track)
     #create line buffer
     trackBuffer = trackLine.buffer(lag)
-    #save the line buffer
-    schemaBuffer = {'geometry': 'Polygon','properties': {'Id':'int:5'},}
-    with fiona.open("trackBuffer.shp", "w", driver='ESRI Shapefile', crs=from_epsg(28992), schema=schemaBuffer) as output:
-        output.write({'geometry': mapping(trackBuffer), 'properties': {'Id':'int:5'}})
+    buffer = gpd.GeoDataFrame({'Id': [0]}, geometry=[trackBuffer], crs='epsg:28992')
+    layers.writeLayer(buffer, 'trackBuffer', sink)
 
-    #intersect the line buffer with land use map
-    buffer = gpd.GeoDataFrame.from_file("trackBuffer.shp")
-    bufferIntersec = []
-    for index, sample in buffer.iterrows():
-        for index2, parcel in land.iterrows():
-            if sample['geometry'].intersects(parcel['geometry']):
-                bufferIntersec.append({'geometry': sample['geometry'].intersection(parcel['geometry']), 'location':sample['Id'], 'land': parcel['BG2010'], 'area':sample['geometry'].intersection(parcel['geometry']).area})
-    df = gpd.GeoDataFrame(bufferIntersec,columns=['geometry', 'location', 'land','area'])
-    df.to_file('intersection.shp')
-    # control of the results in mi case, first values
-    df.head() # image from a Jupiter/IPython notebook
+    #intersect the line buffer with the land use parcels it may touch (spatial index)
+    index = landUseIndexOf(land)
+    parcel, pieces, area = index.overlay(trackBuffer)
+    intersection = gpd.GeoDataFrame({'location': 0, 'land': index.classes[parcel], 'area': area}, geometry=pieces, crs='epsg:28992')
+    layers.writeLayer(intersection, 'intersection', sink)
 
     #aggregate intersection along land use type
-    intersection = gpd.GeoDataFrame.from_file("intersection.shp")
     table = intersection[['geometry', 'land', 'area']]
     table = table.dissolve(by='land', aggfunc='sum', as_index=False)
 
     #land use type probability along the track as the proportion of each land use type of the entire buffer
-    table['Probability'] = None
-    areaTrack = sum(table['area'])
-    for index, attr in table.iterrows():
-        table['Probability'][index] = table['area'][index]/areaTrack
-    df = gpd.GeoDataFrame(table,columns=['geometry', 'land', 'area', 'Probability'])
-    df.to_file('table.shp')
-    df.head()
+    table['Probability'] = table['area']/table['area'].sum()
+    layers.writeLayer(table, 'table', sink)
 
     return table
 
@@ -307,17 +283,15 @@ def distrTable(track, land, lag=30):
 
 
 #Computes a track similarity based on movement similarity and location similarity
-def similarity(track, test, table, land, lag):
-    return moveSim(track, test)+locSim(track, test, table, land, lag)
+def similarity(track, test, table, land, lag, m):
+    return moveSim(track, test, m)+locSim(track, test, table, land, lag)
 
 
+#Computes location similarity based on chi square contingency table of land use probabilities of the test track
+#and the land use table of the track (class -> probability, see landUseDistr), over the classes of the table
 def locSim(track, test, table, land, lag):
-    Vtrack, vsettrack = getV(track)
-    Vtest, vsettest = getV(test)
-
-    contingencytable = []
-    testTable = locTable(test, land, lag)
-    contingencytable = [np.array((testTable['Probability'].values[i], table['Probability'].values[i])) for i in range(len(testTable)) ]
+    testTable = landUseDistr(test, land, lag)
+    contingencytable = [np.array((testTable.get(key, 0), val)) for key, val in luProbs(table).items()]
     print(np.array(contingencytable))
     chi2_stat, p_val, dof, ex = stats.chi2_contingency(np.array(contingencytable))
     print("p_val:"+str(p_val))
@@ -325,66 +299,38 @@ def locSim(track, test, table, land, lag):
 
 
 #Computes movement similarity based on chi square contingency table of movement probabilities of relative vectors in two tracks
-def moveSim(track, test):
-    Vtrack, vsettrack = getV(track)
-    #print [str(v) for v in Vtrack]
-    Vtest, vsettest = getV(test)
-    #print  [str(v) for v in Vtest]
-
-    contingencytable = []
-    for v in vsettest:
-        #print (str(v)+""+str(moveProb(v, Vtest)) +""+ str(moveProb(v, Vtrack)))
-        contingencytable.append([moveProb(v, Vtest) , moveProb(v, Vtrack)])
-        #psum += math.pow((moveProb(v, Vtrack) - p2),2)/p2
-    #chi = psum * track.size
-    print(np.array(contingencytable))
-    chi2_stat, p_val, dof, ex = stats.chi2_contingency(np.array(contingencytable))
+def moveSim(track, test, m):
+    distrtrack = getV(track, m)
+    distrtest = getV(test, m)
+
+    contingencytable = np.column_stack((distrtest.probs, distrtrack.probsOf(distrtest.keys)))
+    print(contingencytable)
+    chi2_stat, p_val, dof, ex = stats.chi2_contingency(contingencytable)
     print("p_val:"+str(p_val))
     return p_val
 
 
 #Extends a track (on one end) based on a probability distribution over relative vectors (movements) in the track sequence
-def ExtendMimic(track, track0, land,layer,p,lag):
+#budget: time/work budget of the extension (extension.Budget); its report is kept in faketrack.attrs['extension']
+def ExtendMimic(track, track0, land,layer,p,lag,m,sink=None,budget=None):
     #Choose an end of the track  (right now only the last point)
-    endindex = track.size-1#int(round(float(randint(0,track.size))/float(track.size))*(track.size-1))
-    end = track[endindex]
-    V, Vset = getV(track)
-    faketrack = track
-    table = locTable(track0, land, lag)
-    #Generate 1 .. max(0.7*track.size) new fake points
-    for i in range(0,randint(1,int(0.8*track.size))):
-        #q = Q.PriorityQueue()
-        #for v in Vset:
-            #print "prob:"+str(probability(v,end, V))
-            #q.put((probability(v,end, V)-1,Vplus(end,v)))
-
-        probdist = [probability(v, V, end, layer, table, lag) for v in Vset]
-        probdist = [i/(sum(probdist)+sys.float_info.epsilon) for i in probdist]
-        #print probdist
-        #print Vset
-        #while not q.empty():
-        for i in range(1,len(Vset)):
-            #candidate = q.get()[1]
-            #This generates a new point candidate based on random choice of relative vectors over movement probability
-            if probdist==1:
-                candidate =  Vplus(end,Vset[np.random.choice(np.arange(len(Vset)), None, p=list(probdist))])
-            else:
-                candidate = end
-            print(candidate)
-            test = faketrack.copy()
-            test.loc[endindex+1] = candidate  # adding a row to the end of the dataframe  (cumbersome because of geopandas)
-            test = test.reset_index(drop=True)  # sorting by index
-            if (candidate not in faketrack) :#& (similarity(track, test) > p):
-                print("Extend track with:"+str(candidate))
-                faketrack = test
-                end = candidate
-                endindex =test.size-1
-                error = False
-                break
-            else:
-                error = True
-        if error:
-            print("Error: no sufficnetly similar candidate found!")
+    cells = grid.cells(trackArray.coords(track), m)
+    distr = getV(track, m)
+    table = landUseDistr(track0, layer, lag)
+    if sink is not None:
+        locTable(track0, land, lag, sink)
+    #Location probabilities are looked up once per cell, only new cells around the current end need a lookup
+    locscores = extension.CellScores(lambda c: getLUProbs(getLanduseclasses(c*float(m), layer, lag), table))
+
+    def weights(end):
+        return locscores(end + distr.keys)
+
+    #Generate 1 .. max(0.8*track.size) new fake points
+    #(candidates are not yet gated by similarity(track, test, table, land, lag, m) > p)
+    budget = budget if budget is not None else extension.Budget()
+    fakecells = extension.extendCells(cells, distr, randint(1,int(0.8*track.size)), weights, budget=budget)
+    faketrack = gpd.GeoSeries(gpd.points_from_xy(fakecells[:,0]*float(m), fakecells[:,1]*float(m)))
+    faketrack.attrs['extension'] = budget.report()
     return faketrack
 
 
@@ -417,29 +363,19 @@ def apply(vgeo, template,m):
     #print [str(p) for p in template]
     return  template
 
-#Masks each point in a track using some template
-def Masking(track, m, r, k, d):
-    out = []
-    Pred = []
-    vntemplate = vNTemplate(r)
-    for v in track:
-        print("Now masking point: "+str(v) )
-        #Randomly shift template
-        temp = apply(v, rdmshift(vntemplate),m)
-        #print temp
-        candidates = [vk for vk in temp if vk not in Pred]
-
-        #Mask
-        candidates.append(v)
-        print([str(p) for p in candidates])
-        mask = candidates
-
-
-        out.extend(mask)
-        Pred = mask
+#Masks each point in a track using some template (randomly shifted von Neumann template of radius r, on the grid of m)
+#dedup: emit every grid cell only once, with the number of times it was masked in the column 'count' (GeoDataFrame)
+def Masking(track, m, r, k, d, dedup=False):
+    cells = grid.cells(trackArray.coords(track), m)
+    out, owner, last = masking.TemplateMasker(r).mask(cells)
 
     print(str(len(out))+" masked points from originally "+str(track.size))
-    outgdf = pointlist2GDF(out)
+    if dedup:
+        out, counts = masking.dedup(out)
+        print(str(len(out))+" unique masked points")
+    outgdf = gpd.GeoSeries(gpd.points_from_xy(out[:,0]*float(m), out[:,1]*float(m)), name='points')
+    if dedup:
+        outgdf = gpd.GeoDataFrame({'points': outgdf, 'count': counts}, geometry='points')
     return outgdf
 
 #Turns point list into geopandas data frame
@@ -450,13 +386,19 @@ def pointlist2GDF(pointlist):
 
 
 """Main crowding function"""
-def Crowd(track, land, layer, k=10, p = 0.02, lag=50) :
-    track['points'] = list(zip(track.X, track.Y))
-    track['points']  = track['points'].apply(Point)
-    trackgdf = gpd.GeoDataFrame(track, geometry='points')
-    trackgdf.crs = {"init": 'epsg:4326'}
-    trackgdf = trackgdf.to_crs({"init": 'epsg:28992'})
-    trackgdf.to_file(driver = 'ESRI Shapefile', filename = 'track.shp')
+#Returns the intermediate tracks as in-memory layers (track, rastertrack, faketrack, maskedtrack);
+#they are also saved as shapefiles in the sink if given (a directory or a /vsimem/ path, see layers.py)
+#and the lookup (grid.CellIndex) from the cells of the rasterized track to the original points, e.g. to join point
+#attributes onto crowded or masked cells: lookup.join(values, grid.cellKeys(cells))
+#resolution: cell size (m) to rasterize the land use layer to for the land use lookups (None: exact polygon lookups)
+#budget: time/work budget of the extension (see ExtendMimic)
+#persist: keep the spatial index of the layer next to the shapefile for later runs (see landUseIndex.loadIndex)
+def Crowd(track, land, layer, k=10, p = 0.02, lag=50, dedup=False, sink=None, resolution=None, budget=None, persist=True) :
+    if isinstance(track, trackArray.Track):
+        trackgdf = track.project(reproject.RD).toGeoDataFrame(geometry='points')
+    else:
+        trackgdf = reproject.rdFrame(track)
+    layers.writeLayer(trackgdf, 'track', sink)
     #print trackgdf
 
     #Maximum distance parameter
@@ -475,15 +417,22 @@ def Crowd(track, land, layer, k=10, p = 0.02, lag=50) :
 
     #Start of the programming logic
     lookup,rastertrack = Rasterize(trackgdf['points'],m)
-    rastertrack.to_file(driver = 'ESRI Shapefile', filename = 'rastertrack.shp')
+    layers.writeLayer(rastertrack, 'rastertrack', sink)
 
 
-    faketrack = ExtendMimic(rastertrack,trackgdf['points'],land,layer,p,lag)
+    #Land use lookups on the layer rasterized with cell size resolution (raster speed) instead of the polygons
+    if resolution:
+        layer = landUseIndex.loadGrid(layer, resolution, persist)
+    elif not isinstance(layer, landUseRaster.LandUseGrid):
+        layer = landUseIndexOf(layer, persist)
+    faketrack = ExtendMimic(rastertrack,trackgdf['points'],land,layer,p,lag,m,sink,budget)
     print(faketrack)
-    faketrack.to_file(driver = 'ESRI Shapefile', filename = 'faketrack.shp')
+    layers.writeLayer(faketrack, 'faketrack', sink)
+
+    maskedtrack = Masking(faketrack,m, r, k, d, dedup)
+    layers.writeLayer(maskedtrack, 'maskedtrack', sink)
 
-    maskedtrack = Masking(faketrack,m, r, k, d)
-    maskedtrack.to_file(driver = 'ESRI Shapefile', filename = 'maskedtrack.shp')
+    return {'track': trackgdf, 'rastertrack': rastertrack, 'faketrack': faketrack, 'maskedtrack': maskedtrack, 'lookup': lookup}
 
 
 
@@ -496,7 +445,7 @@ def Crowd(track, land, layer, k=10, p = 0.02, lag=50) :
 
 
 
-def run(f):
+def run(f, sink=None, resolution=None, persist=True):
 ##    track='data\\2420.csv'
 ##    df = pd.read_csv(track)
 ##    for track, trackdf in df.groupby("track"):
@@ -515,8 +464,8 @@ def run(f):
     land = gpd.GeoDataFrame.from_file(layer)
     
     df = pd.read_csv(f)
-    track = df[['X','Y']]
-    Crowd(track, land, layer)
+    track = df[reproject.xyColumns(df)]
+    return Crowd(track, land, layer, sink=sink, resolution=resolution, persist=persist)
 
 
 
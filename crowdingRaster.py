@@ -39,6 +39,20 @@ from shapely.ops import transform
 from scipy import stats
 import rtree
 
+import corridor
+import decoyPool
+import extension
+import grid
+import gridTrack
+import landUseCache
+import layers
+import landUseRaster
+import masking
+import movement
+import reproject
+import trackArray
+import trackSimilarity
+
 #Spatial vector operations. These are used to implement vector algebra with shapely geometries for template masking
 def Vminus(p1, p2):  #Vector subtraction
     return Point(p1.x - p2.x, p1.y - p2.y)
@@ -52,18 +66,20 @@ def Vmult(m, p): #Multiplication of a vector with a scalar
 
 """Functions for rasterization of track"""
 
-def Rasterize(track,m):
+#Rounds each point in the track based on rounding increment m. Returns the rasterized track (unique cells in track order)
+#and a lookup index from each raster cell to its original points (for picking enrichments for each point of the initial track)
+#compact: return the rasterized track as integer cells (gridTrack.GridTrack) instead of a GeoSeries of points
+#lookup: the lookup of the track on the grid of m if it is known already (e.g. from personContext.PersonContext.prepare)
+def Rasterize(track,m,compact=False,lookup=None):
     print('Size of original track:'+str(track.size))
-    #This rounds each point in the track based on rounding increment m
-    lookup = track.apply(lambda p: (np.round(p.x/m)*m, np.round(p.y/m)*m) )
-    rt = pd.DataFrame({'points': lookup.unique()})
-    print("lookup table (for picking enrichments for each point of the initial track):")
-    lookup = lookup.apply(lambda points: Point(points))
-    print(lookup)
-
-    rt['geom'] = rt['points'].apply(Point)
-
-    rastertrack = gpd.GeoDataFrame(rt, geometry='geom')['geom']
+    if lookup is None:
+        xy, lookup = grid.rasterize(trackArray.coords(track), m)
+    else:
+        xy = grid.keyCells(lookup.keys)*float(m)
+    if compact:
+        rastertrack = gridTrack.GridTrack.fromCoords(xy, m)
+    else:
+        rastertrack = gpd.GeoSeries(gpd.points_from_xy(xy[:,0], xy[:,1]), name='geom')
 
     print("rasterized track:")
     print(rastertrack)
@@ -74,28 +90,15 @@ def Rasterize(track,m):
 
 """Functions for track extension (mimick)"""
 
-#Generates a list of difference vectors for a track sequence. Also generates a corresponding set  with unique point values.
-def getV(track):
-    #Get the vector difference between all pairs of points in the track
-     V = [Vminus(track[i[0]+1], p) for i,p in np.ndenumerate(track.values) if i[0]+1 < track.size]
-     Vset =[]
-     for v in V:
-        #count = 0
-        insert = True
-        for vv in Vset:
-            if not v.equals(vv):
-                insert = True
-            else:
-                insert = False
-                break
-        if insert:
-            Vset.append(v)
-     return  V, Vset
+#Generates the movement distribution of a track sequence: the difference vectors between consecutive points
+#as integer offsets in units of the rounding increment m, the set of unique vectors and their probabilities
+def getV(track, m):
+    return movement.MoveDistr.fromTrack(track, m)
 
 #Generates a distance list for a track sequence
 def getDistances(track):
     #Returns an array of distances in a sequence of point geometries in the track
-   return [x.distance(track[i[0]+1]) for i,x in np.ndenumerate(track.values) if i[0]+1 < track.values.size]
+    return np.hypot(*np.diff(trackArray.coords(track), axis=0).T)
 
 
 """A function for looking up Raster cell row/colum projected in RD_new, based on a WGS84 coordinate pair as input as well as a Geo raster tile"""
@@ -131,27 +134,22 @@ def generate_index(records, index_path):
 '''
 
 
-def getLUProb(newLoc, land, table, lag):
-    buffernewLoc = newLoc.buffer(lag)
-    stats = zonal_stats(buffernewLoc, land, categorical=True)
+#Land use probabilities of many candidate locations (N,2) in one call: the probability in table of the most frequent land use
+#within lag of each location (array indexing if focal rasters for lag were precomputed with landUseRaster.buildFocal).
+#Locations outside the land use raster or on nodata are masked with probability 0
+def getLUProbs(newLocs, land, table, lag):
     # Most frequent land use type as the mode
-    modeLand = max(stats[0].items(), key=operator.itemgetter(1))[0]
-    if modeLand in table.keys():
-        prob = table[modeLand]
-    else:
-        prob = 0.05
-    return prob
+    modeLand, valid = landUseRaster.loadGrid(land).modeClass(newLocs, lag)
+    return landUseRaster.tableProbs(modeLand, valid, table, default=0.05)
+
+
+def getLUProb(newLoc, land, table, lag):
+    return getLUProbs(np.array([[newLoc.x, newLoc.y]]), land, table, lag)[0]
 
 
 #Computes a movement probability (probability that a relative vector occurs in the sequence of a track)
-def moveProb(v, V):
-    c = 0
-    #Count the number of occurrences of this movement in the track
-    for vi in V:
-        if vi.equals(v):
-        #if (vi.x == v.x) & (vi.y == v.y):
-            c+=1
-    return float(c)/float(len(V))
+def moveProb(v, distr):
+    return distr.prob(v)
 
 
 def locProb(v, end, land, table, lag):
@@ -164,21 +162,18 @@ def locProb(v, end, land, table, lag):
 
 
 # Computes a combined probability out of movement and location probablity
-def probability(v, V, end, land, table, lag=30):
-    return moveProb(v, V)*locProb(v, end, land, table, lag)
+def probability(v, distr, end, land, table, lag=30):
+    return moveProb(v, distr)*locProb(v, end, land, table, lag)
 
 
 # Generates a location probability by using raster land use base map
 def locTable(track, land, lag):
-    #convert point into line: line is equivalent to infinite number of sampling point to query land use type
-    trackLine = geometry.LineString(track)
-    #create line buffer
-    trackBuffer = trackLine.buffer(lag)
-    categoryCount = zonal_stats(trackBuffer, land, categorical=True)  # count of each class pixels
-    stats = zonal_stats(trackBuffer, land)  # stats of total count
-    total = stats[0]['count']  # total
+    #corridor of radius lag along the track line: line is equivalent to infinite number of sampling point to query land use type
+    stats = corridor.corridorStats(track, landUseRaster.loadGrid(land), [lag], categorical=True)[lag]
+    categoryCount = stats['categories']  # count of each class pixels
+    total = stats['count']  # total
     
-    categoryProb = {k: v / total for k, v in categoryCount[0].items()}  # Normailze to probability
+    categoryProb = {k: v / total for k, v in categoryCount.items()}  # Normailze to probability
     # Most frequent land use type as the mode    
     return categoryProb
     
@@ -200,28 +195,18 @@ def locTable(track, land, lag):
 
 
 #Computes movement similarity based on chi square contingency table of movement probabilities of relative vectors in two tracks
-def moveSim(track, test):
-    Vtrack, vsettrack = getV(track)
-    #print [str(v) for v in Vtrack]
-    Vtest, vsettest = getV(test)
-    #print  [str(v) for v in Vtest]
+def moveSim(track, test, m):
+    distrtrack = getV(track, m)
+    distrtest = getV(test, m)
 
-    contingencytable = []
-    for v in vsettest:
-        #print (str(v)+""+str(moveProb(v, Vtest)) +""+ str(moveProb(v, Vtrack)))
-        contingencytable.append([moveProb(v, Vtest) , moveProb(v, Vtrack)])
-        #psum += math.pow((moveProb(v, Vtrack) - p2),2)/p2
-    #chi = psum * track.size
-    print(np.array(contingencytable))
-    chi2_stat, p_val, dof, ex = stats.chi2_contingency(np.array(contingencytable))
+    contingencytable = np.column_stack((distrtest.probs, distrtrack.probsOf(distrtest.keys)))
+    print(contingencytable)
+    chi2_stat, p_val, dof, ex = stats.chi2_contingency(contingencytable)
     print("p_val:"+str(p_val))
     return p_val
 
 
 def locSim(track, test, table, land, lag):
-    Vtrack, vsettrack = getV(track)
-    Vtest, vsettest = getV(test)
-
     contingencytable = []
     testTable = locTable(test, land, lag)
     contingencytable = [np.array((testTable[key], 
@@ -233,53 +218,52 @@ def locSim(track, test, table, land, lag):
 
 
 # Computes a track similarity based on movement similarity and location similarity
-def similarity(track, test, table, land, lag):
-    return moveSim(track, test)+locSim(track, test, table, land, lag)
+def similarity(track, test, table, land, lag, m):
+    return moveSim(track, test, m)+locSim(track, test, table, land, lag)
+
+
+#Extends a rasterized track of integer cells with movement distribution distr and land use table (the cells of ExtendMimic)
+#resume: continue the budget of a previous pass (see extension.extendCells)
+def mimicCells(cells, distr, land, table, p, lag, m, gate=False, budget=None, resume=False):
+    #Location probabilities are scored once per cell, only new cells around the current end need scoring;
+    #their land use classes are shared across tracks in the class cache of the land use raster
+    classes = landUseCache.loadCache(land)
+    locscores = extension.CellScores(lambda c: classes.probs(c, m, lag, table))
+
+    def weights(end):
+        return locscores(end + distr.keys)
+
+    #Generate 1 .. max(0.5*track.size) new fake points
+    simgate = trackSimilarity.SimilarityGate(cells, distr, land, table, lag, p) if gate else None
+    return extension.extendCells(cells, distr, randint(1,int(0.5*len(cells))), weights, simgate, budget, resume)
 
 
 #Extends a track (on one end) based on a probability distribution over relative vectors (movements) in the track sequence
-def ExtendMimic(track, track0, land, p, lag):
+#gate: only accept candidates for which similarity(track, test, table, land, lag, m) > p, tested incrementally
+#budget: time/work budget of the extension (extension.Budget); its report is kept in faketrack.attrs['extension']
+#distr/table: movement distribution and land use table to extend with (default: those of track and track0)
+#decoys: extend with decoy segments of other users than owner near the end (decoyPool.DecoyPool); if none is near,
+#the track is extended with its own movement distribution. Grid tracks (gridTrack.GridTrack) are extended as grid tracks
+def ExtendMimic(track, track0, land, p, lag, m, gate=False, budget=None, distr=None, table=None, decoys=None, owner=None):
     #Choose an end of the track  (right now only the last point)
-    endindex = track.size-1#int(round(float(randint(0,track.size))/float(track.size))*(track.size-1))
-    end = track[endindex]
-    V, Vset = getV(track)
-    faketrack = track
-    table = locTable(track0, land, lag)
-    #Generate 1 .. max(0.7*track.size) new fake points
-    for i in range(0,randint(1,int(0.5*track.size))):
-        #q = Q.PriorityQueue()
-        #for v in Vset:
-            #print "prob:"+str(probability(v,end, V))
-            #q.put((probability(v,end, V)-1,Vplus(end,v)))
-
-        probdist = [probability(v, V, end, land, table, lag) for v in Vset]
-        if sum(probdist)==1:
-            probdist = [i/sum(probdist) for i in probdist]  # Normalize to 1
-        else:
-            probdist = [1/len(probdist) for i in probdist]
-        #print probdist
-        #print Vset
-        #while not q.empty():
-        print(len(Vset))
-        for i in range(1,len(Vset)):
-            #candidate = q.get()[1]
-            #This generates a new point candidate based on random choice of relative vectors over movement probability
-            candidate =  Vplus(end,Vset[np.random.choice(np.arange(len(Vset)), None, p=list(probdist))])
-            print(candidate)
-            test = faketrack.copy()
-            test.loc[endindex+1] = candidate  # adding a row to the end of the dataframe  (cumbersome because of geopandas)
-            test = test.reset_index(drop=True)  # sorting by index
-            if (candidate not in faketrack) :#& (similarity(track, test) > p):
-                print("Extend track with:"+str(candidate))
-                faketrack = test
-                end = candidate
-                endindex =test.size-1
-                error = False
-                break
-            else:
-                error = True
-        if error:
-            print("Error: no sufficiently similar candidate found!")
+    cells = trackArray.cells(track, m)
+    land = landUseRaster.loadGrid(land)
+    budget = budget if budget is not None else extension.Budget()
+    fakecells = None
+    if decoys is not None:
+        fakecells = decoyPool.extendCells(cells, m, decoys, randint(1,int(0.5*len(cells))), owner, budget=budget)
+        if not budget.added and not budget.exhausted:
+            fakecells = None
+    if fakecells is None:
+        distr = distr if distr is not None else getV(track, m)
+        table = table if table is not None else locTable(track0, land, lag)
+        #The fallback spends what is left of the budget, so the report covers both passes
+        fakecells = mimicCells(cells, distr, land, table, p, lag, m, gate, budget, resume=decoys is not None)
+    if isinstance(track, gridTrack.GridTrack):
+        faketrack = gridTrack.GridTrack(fakecells, m, crs=track.crs)
+    else:
+        faketrack = gpd.GeoSeries(gpd.points_from_xy(fakecells[:,0]*float(m), fakecells[:,1]*float(m)))
+    faketrack.attrs['extension'] = budget.report()
     return faketrack
 
 
@@ -311,29 +295,22 @@ def apply(vgeo, template,m):
     #print [str(p) for p in template]
     return  template
 
-#Masks each point in a track using some template
-def Masking(track, m, r, k, d):
-    out = []
-    Pred = []
-    vntemplate = vNTemplate(r)
-    for v in track:
-        print("Now masking point: "+str(v) )
-        #Randomly shift template
-        temp = apply(v, rdmshift(vntemplate),m)
-        #print temp
-        candidates = [vk for vk in temp if vk not in Pred]
-
-        #Mask
-        candidates.append(v)
-        print([str(p) for p in candidates])
-        mask = candidates
-
-
-        out.extend(mask)
-        Pred = mask
+#Masks each point in a track using some template (randomly shifted von Neumann template of radius r, on the grid of m)
+#dedup: emit every grid cell only once, with the number of times it was masked in the column 'count' (GeoDataFrame)
+#Grid tracks (gridTrack.GridTrack) are masked into grid tracks (with the multiplicities in counts if dedup)
+def Masking(track, m, r, k, d, dedup=False):
+    cells = trackArray.cells(track, m)
+    out, owner, last = masking.TemplateMasker(r).mask(cells)
 
     print(str(len(out))+" masked points from originally "+str(track.size))
-    outgdf = pointlist2GDF(out)
+    if dedup:
+        out, counts = masking.dedup(out)
+        print(str(len(out))+" unique masked points")
+    if isinstance(track, gridTrack.GridTrack):
+        return gridTrack.GridTrack(out, m, counts if dedup else None, track.crs)
+    outgdf = gpd.GeoSeries(gpd.points_from_xy(out[:,0]*float(m), out[:,1]*float(m)), name='points')
+    if dedup:
+        outgdf = gpd.GeoDataFrame({'points': outgdf, 'count': counts}, geometry='points')
     return outgdf
 
 #Turns point list into geopandas data frame
@@ -343,62 +320,156 @@ def pointlist2GDF(pointlist):
         return outputframe
 
 
+#Crowding parameters for the distances between consecutive track points and k:
+#maximum distance parameter d, rounding increment m and template radius r
+def crowdParams(distances, k):
+    d = 1.3* max(distances)
+    m = math.floor(d/(math.sqrt(2 * k/math.pi)))
+    return d, m, templateRadius(k)
+
+
+def templateRadius(k):
+    return int(math.ceil((-1 + math.sqrt(1+4*k))/2))
+
+
 """Main crowding function"""
-def Crowd(track, land, numHome, k=10, p = 0.02, lag=50) :
-    track['points'] = list(zip(track.X, track.Y))
-    track['points']  = track['points'].apply(Point)
-    trackgdf = gpd.GeoDataFrame(track, geometry='points')
-    trackgdf.crs = {"init": 'epsg:4326'}
-    trackgdf = trackgdf.to_crs({"init": 'epsg:28992'})
-    trackgdf.to_file(driver = 'ESRI Shapefile', filename = 'track.shp')
+#Returns the intermediate tracks as in-memory layers (track, rastertrack, faketrack, maskedtrack);
+#they are also saved as shapefiles in the sink if given (a directory or a /vsimem/ path, see layers.py)
+#and the lookup (grid.CellIndex) from the cells of the rasterized track to the original points, e.g. to join point
+#attributes onto crowded or masked cells: lookup.join(values, grid.cellKeys(cells))
+#budget: time/work budget of the extension (see ExtendMimic)
+#context: crowding context of the person of the track (personContext.PersonContext, with the same k and lag)
+#decoys/owner: pool of decoy segments to extend with (see ExtendMimic); the fake track is added to it for owner
+#compact: hold the raster, fake and masked tracks as integer cells (gridTrack.GridTrack); points are only created when
+#they are saved or read as layers
+def Crowd(track, land, numHome, k=10, p = 0.02, lag=50, dedup=False, sink=None, gate=False, budget=None, context=None,
+          decoys=None, owner=None, compact=False) :
+    if isinstance(track, trackArray.Track):
+        trackgdf = track.project(reproject.RD).toGeoDataFrame(geometry='points')
+    else:
+        trackgdf = reproject.rdFrame(track)
+    layers.writeLayer(trackgdf, 'track', sink)
     #print trackgdf
 
-    #Maximum distance parameter
-    distances = getDistances(trackgdf['points'])
-    d = 1.3* max(distances)
+    #Maximum distance parameter, rounding increment and template radius
+    state = context.prepare(trackgdf['points']) if context is not None else {}
+    d, m, r = (state['d'], state['m'], state['r']) if state else crowdParams(getDistances(trackgdf['points']), k)
     print('the distance parameter is '+str(d))
-
-    #Rounding increment
-    m = math.floor(d/(math.sqrt(2 * k/math.pi)))
     print('the rounding increment is '+str(m))
-
-    #Template radius
-    r = int(math.ceil((-1 + math.sqrt(1+4*k))/2))
     print('the template radius is '+str(r))
     
     #Get real home location
-    pArray = np.array([[pt.x, pt.y] for ind, pt in np.ndenumerate(trackgdf['points'].values)])
+    pArray = trackArray.coords(trackgdf['points'])
     if not numHome:
         home = np.zeros((2,))
     else:
         home = pArray[-numHome:].mean(axis=0)
 
     #Start of the programming logic
-    lookup,rastertrack = Rasterize(trackgdf['points'],m)
-    rastertrack.to_file(driver = 'ESRI Shapefile', filename = 'rastertrack.shp')
+    lookup,rastertrack = Rasterize(trackgdf['points'],m,compact,state.get('lookup'))
+    layers.writeLayer(rastertrack, 'rastertrack', sink)
 
 
-    faketrack = ExtendMimic(rastertrack,trackgdf['points'],land,p,lag)
+    faketrack = ExtendMimic(rastertrack,trackgdf['points'],land,p,lag,m,gate,budget,state.get('distr'),state.get('table'),decoys,owner)
     print(faketrack)
-    faketrack.to_file(driver = 'ESRI Shapefile', filename = 'faketrack.shp')
+    layers.writeLayer(faketrack, 'faketrack', sink)
 
-    maskedtrack = Masking(faketrack,m, r, k, d)
-    maskedtrack.to_file(driver = 'ESRI Shapefile', filename = 'maskedtrack.shp')
+    maskedtrack = Masking(faketrack,m, r, k, d, dedup)
+    layers.writeLayer(maskedtrack, 'maskedtrack', sink)
+    if decoys is not None:
+        decoys.insert(trackArray.coords(faketrack), owner)
     
-    return home
-
-
-
-
-
-
-
-
-
-
-
-
-def run(f):
+    return home, {'track': trackgdf, 'rastertrack': rastertrack, 'faketrack': faketrack, 'maskedtrack': maskedtrack, 'lookup': lookup}
+
+
+
+
+
+
+
+
+
+
+
+
+#Crowds many (short) tracks at once. The tracks are given as a ragged batch: the concatenated coordinates xy (N,2)
+#in crs and offsets (T+1,), track t being xy[offsets[t]:offsets[t+1]]. Projection, the crowding parameters,
+#rasterization and masking run as array operations over the whole batch; the extension (a random walk per track)
+#runs per track on the shared land use grid. numHome: number of home points at the end of each track (T,) or None.
+#Returns a dict of ragged results (coordinates in RD New, offsets): 'raster', 'fake' (raster track and its
+#extension) and 'masked' (with the multiplicity of each cell in 'counts' if dedup), and the per track 'home' and 'm'.
+#budget: time/work budget of the extension of each track; the per track reports are in 'extension' (None if not extended)
+def crowd_many(xy, offsets, land, numHome=None, k=10, p = 0.02, lag=50, crs=reproject.WGS84, dedup=False, gate=False, budget=None):
+    offsets = np.asarray(offsets, dtype=np.int64)
+    ntracks = len(offsets) - 1
+    sizes = np.diff(offsets)
+    if ntracks < 1 or offsets[0] != 0 or (sizes < 1).any():
+        raise ValueError('offsets must start at 0 and describe non-empty tracks')
+    xy = reproject.project(xy, crs, reproject.RD) if crs != reproject.RD else np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+    if offsets[-1] != len(xy):
+        raise ValueError('offsets do not match '+str(len(xy))+' points')
+    track = np.repeat(np.arange(ntracks), sizes)
+    land = landUseRaster.loadGrid(land)
+
+    #Maximum distance parameter and rounding increment of each track, template radius
+    steps = np.zeros(len(xy))
+    steps[1:] = np.hypot(*np.diff(xy, axis=0).T)
+    steps[offsets[:-1]] = 0.0
+    d = 1.3*np.maximum.reduceat(steps, offsets[:-1])
+    m = np.floor(d/(math.sqrt(2 * k/math.pi)))
+    if (m <= 0).any():
+        raise ValueError('tracks '+str(np.nonzero(m <= 0)[0].tolist())+' are too short for a rounding increment')
+    r = templateRadius(k)
+
+    #Real home locations
+    home = np.zeros((ntracks, 2))
+    if numHome is not None:
+        for t, n in enumerate(np.asarray(numHome, dtype=np.int64).reshape(-1)):
+            if n:
+                home[t] = xy[offsets[t+1]-n:offsets[t+1]].mean(axis=0)
+
+    #Rasterize: first occurrence of each cell within its track
+    cells = grid.cells(xy/m[track][:, None], 1)
+    first, counts = grid.groupFirst(grid.cellKeys(cells), track)
+    rcells, rtrack = cells[first], track[first]
+    roffsets = np.concatenate(([0], np.cumsum(np.bincount(rtrack, minlength=ntracks))))
+
+    #Extend each track at its end
+    fake, reports = [], []
+    budget = budget if budget is not None else extension.Budget()
+    for t in range(ntracks):
+        tcells = rcells[roffsets[t]:roffsets[t+1]]
+        if len(tcells) < 2:
+            fake.append(tcells)
+            reports.append(None)
+            continue
+        distr = movement.MoveDistr(np.diff(tcells, axis=0), m[t])
+        table = locTable(xy[offsets[t]:offsets[t+1]], land, lag)
+        fake.append(mimicCells(tcells, distr, land, table, p, lag, m[t], gate, budget))
+        reports.append(budget.report())
+    foffsets = np.concatenate(([0], np.cumsum([len(c) for c in fake])))
+    fcells = np.concatenate(fake)
+    ftrack = np.repeat(np.arange(ntracks), np.diff(foffsets))
+
+    #Mask all fake tracks in one pass, restarting the template chain at each track
+    starts = np.zeros(len(fcells), dtype=bool)
+    starts[foffsets[:-1]] = True
+    out, owner, last = masking.TemplateMasker(r).mask(fcells, starts=starts)
+    mtrack = ftrack[owner]
+    result = {}
+    if dedup:
+        mfirst, mcounts = grid.groupFirst(grid.cellKeys(out), mtrack)
+        out, mtrack = out[mfirst], mtrack[mfirst]
+        result['counts'] = mcounts
+    moffsets = np.concatenate(([0], np.cumsum(np.bincount(mtrack, minlength=ntracks))))
+
+    result.update({'raster': (rcells*m[rtrack][:, None], roffsets), 'fake': (fcells*m[ftrack][:, None], foffsets),
+                   'masked': (out*m[mtrack][:, None], moffsets), 'home': home, 'm': m, 'extension': reports})
+    return result
+
+
+#Crowds the track in the csv file f. Returns the real home location, the run time and the crowded layers
+def run(f, sink=None, land='landUse.tif', budget=None, compact=False):
 ##    track='data\\2420.csv'
 ##    df = pd.read_csv(track)
 ##    for track, trackdf in df.groupby("track"):
@@ -415,8 +486,6 @@ def run(f):
     
 #    layer = 'sampleLandUse.shp'
 #    land = gpd.GeoDataFrame.from_file(layer)
-    land = 'landUse.tif'
-    NDV, xsize, ysize, GeoT, Projection, DataType = gr.get_geo_info(land)
     
     df = pd.read_csv(f)
     numHome = 0
@@ -424,13 +493,13 @@ def run(f):
         if row['purpose'] == 'home': #or row['purto']=='home':
             numHome += 1
     
-    track = df[['X','Y']]
+    track = df[reproject.xyColumns(df)]
     
-    start = time.clock()
-    home = Crowd(track, land, numHome, k=10, p = 0.02, lag=50)
-    speed = time.clock()-start
+    start = time.perf_counter()
+    home, crowded = Crowd(track, land, numHome, k=10, p = 0.02, lag=50, sink=sink, budget=budget, compact=compact)
+    speed = time.perf_counter()-start
     
-    return home, speed
+    return home, speed, crowded
 
 
 
@@ -0,0 +1,169 @@
+#-------------------------------------------------------------------------------
+# Name:        Crowding session
+# Purpose:     Online (point by point) simulated crowding of a live GPS feed with the
+#              raster implementation. Fixes are rasterized and masked as they arrive,
+#              the movement statistics and the land use table of the track are updated
+#              incrementally, and the track is extended with fake points (ExtendMimic)
+#              when the session is closed. Memory is bounded by the window of recent cells
+#              the session remembers. Results are comparable with crowdingRaster.Crowd:
+#                  session = CrowdingSession('landUse.tif')
+#                  raster, masked = session.push(xy)      # for each fix or batch of fixes
+#                  fake, masked = session.close()
+#
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+from collections import OrderedDict
+
+import numpy as np
+
+import corridor
+import crowdingRaster
+import extension
+import grid
+import landUseRaster
+import masking
+import movement
+import reproject
+
+
+class CrowdingSession(object):
+
+    #land:   land use raster; k, p, lag as in crowdingRaster.Crowd
+    #m:      rounding increment; if None, it is estimated from the first warmup fixes (as Crowd does from the whole track)
+    #crs:    CRS of the fixes (they are projected to RD New)
+    #dedup:  emit every masked grid cell only once (counts in self.maskcounts)
+    #gate:   similarity gate for the extension (see ExtendMimic)
+    #budget: time/work budget of the extension at closing (extension.Budget); its report is in self.extension
+    #window: number of recent rasterized cells remembered (and masked cells for dedup, corridor pixels in proportion);
+    #        a fix in a cell older than that is emitted again, and the extension continues the last window cells.
+    #        None: remember all (memory grows with the track)
+    def __init__(self, land, k=10, p=0.02, lag=50, m=None, warmup=20, crs=reproject.WGS84, dedup=False, gate=False, budget=None,
+                 window=5000):
+        self.land = landUseRaster.loadGrid(land)
+        self.k = k
+        self.p = p
+        self.lag = lag
+        self.m = m
+        self.d = None
+        self.r = crowdingRaster.templateRadius(k)
+        self.warmup = warmup
+        self.crs = crs
+        self.dedup = dedup
+        self.gate = gate
+        self.budget = budget if budget is not None else extension.Budget()
+        self.extension = None
+        self.masker = masking.TemplateMasker(self.r)
+        self.window = window
+        #Land use distribution along the original fixes (the table of locTable), remembering the pixels of about window
+        #cells of corridor
+        pixels = None
+        if window is not None:
+            pixels = window*int(landUseRaster.diskFootprint(lag, self.land.res).sum())
+        self.corridor = corridor.CorridorCounts(self.land, lag, pixels)
+        #Recent cells of the rasterized track (cell id -> cell, in order of first occurrence), its end and number of cells,
+        #and its movement counts (offset -> count, in order of first occurrence)
+        self.recent = OrderedDict()
+        self.end = None
+        self.ncells = 0
+        self.moves = {}
+        #Multiplicity of recent masked cells (cell id -> count), for dedup
+        self.maskcounts = OrderedDict()
+        self._pending = np.zeros((0, 2))
+        self._last = None
+        self._prevmask = None
+        self.closed = False
+
+    #Recent cells of the rasterized track (the last window cells)
+    @property
+    def cells(self):
+        return np.array(list(self.recent.values()), dtype=np.int64).reshape(-1, 2)
+
+    #Land use distribution (class -> probability) of the fixes received so far
+    def table(self):
+        return self.corridor.probs()
+
+    #Movement probabilities of the rasterized track received so far (offset in units of m -> probability)
+    def moveProbs(self):
+        total = float(max(sum(self.moves.values()), 1))
+        return {v: n/total for v, n in self.moves.items()}
+
+    #Movement distribution of the rasterized track received so far (getV, from the movement counts)
+    def distr(self):
+        offsets = np.array(list(self.moves.keys()), dtype=np.int64).reshape(-1, 2)
+        return movement.MoveDistr(np.repeat(offsets, list(self.moves.values()), axis=0), self.m)
+
+    #Adds fixes (N,2) in the CRS of the session. Returns the newly rasterized points and the newly masked points (RD New).
+    #Before m is known (warmup), fixes are held back and nothing is emitted.
+    def push(self, xy):
+        if self.closed:
+            raise ValueError('Session is closed')
+        xy = reproject.project(xy, self.crs, reproject.RD) if self.crs != reproject.RD else np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        if not len(xy):
+            return np.zeros((0, 2)), np.zeros((0, 2))
+        #Land use table: corridor of the new segments of the original track
+        self.corridor.extend(xy if self._last is None else np.vstack((self._last, xy)))
+        self._last = xy[-1]
+        if self.m is None:
+            self._pending = np.vstack((self._pending, xy))
+            if len(self._pending) < self.warmup:
+                return np.zeros((0, 2)), np.zeros((0, 2))
+            self._start()
+            xy, self._pending = self._pending, np.zeros((0, 2))
+        return self._emit(self._rasterize(xy))
+
+    #Rounding increment from the warmup fixes
+    def _start(self):
+        self.d, self.m, self.r = crowdingRaster.crowdParams(np.hypot(*np.diff(self._pending, axis=0).T), self.k)
+
+    #New cells of fixes (first occurrences within the window only, as Rasterize), with their movement counts
+    def _rasterize(self, xy):
+        new = []
+        cells = grid.cells(xy, self.m)
+        for cell, key in zip(cells, grid.cellKeys(cells).tolist()):
+            if key in self.recent:
+                continue
+            if self.end is not None:
+                v = tuple((cell - self.end).tolist())
+                self.moves[v] = self.moves.get(v, 0) + 1
+            self.recent[key] = cell
+            if self.window is not None and len(self.recent) > self.window:
+                self.recent.popitem(last=False)
+            self.end = cell
+            self.ncells += 1
+            new.append(cell)
+        return np.array(new, dtype=np.int64).reshape(-1, 2)
+
+    #Masks new cells, continuing the template chain of the previous call (as Masking on the whole track)
+    def _emit(self, cells):
+        out, owner, self._prevmask = self.masker.mask(cells, self._prevmask)
+        if self.dedup and len(out):
+            keys = grid.cellKeys(out).tolist()
+            first = []
+            for i, key in enumerate(keys):
+                if key not in self.maskcounts:
+                    first.append(i)
+                self.maskcounts[key] = self.maskcounts.get(key, 0) + 1
+            if self.window is not None:
+                while len(self.maskcounts) > self.window*len(self.masker.template):
+                    self.maskcounts.popitem(last=False)
+            out = out[first]
+        return cells*float(self.m), out*float(self.m)
+
+    #Extends the track with fake points (ExtendMimic, continuing the recent cells) and masks them. Returns the points emitted at closing:
+    #rasterized points (fixes still held back in warmup, then the fake points) and masked points
+    def close(self):
+        if self.closed:
+            raise ValueError('Session is closed')
+        raster, masked = np.zeros((0, 2)), np.zeros((0, 2))
+        if self.m is None and len(self._pending) > 1:
+            self._start()
+            raster, masked = self._emit(self._rasterize(self._pending))
+        self.closed = True
+        if len(self.recent) < 2:
+            return raster, masked
+        cells = self.cells
+        fakecells = crowdingRaster.mimicCells(cells, self.distr(), self.land, self.table(), self.p, self.lag, self.m, self.gate, self.budget)
+        self.extension = self.budget.report()
+        fakeraster, fakemasked = self._emit(fakecells[len(cells):])
+        return np.vstack((raster, fakeraster)), np.vstack((masked, fakemasked))
@@ -0,0 +1,154 @@
+#-------------------------------------------------------------------------------
+# Name:        Decoy pool
+# Purpose:     Pool of movement fragments of already obfuscated tracks of other users,
+#              indexed by a grid hash on the start of each fragment, so that decoy
+#              segments near a location are found in O(1) on average (one dict lookup
+#              per hash cell within the search radius). The pool is built in bulk from a
+#              store of crowded tracks and grows as new tracks are crowded. Crowding can
+#              extend a track with nearby decoy segments (moved to start at the end of the
+#              track) instead of drawing every fake point from the track's own movement
+#              distribution:
+#                  pool = DecoyPool.fromFrame(crowded)     # person, X, Y (or RDX, RDY) per track
+#                  home, crowded = crowdingRaster.Crowd(track, land, numHome, decoys=pool, owner=person)
+#
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+import numpy as np
+
+import extension
+import grid
+import reproject
+import trackArray
+
+
+class DecoyPool(object):
+
+    #cell:   size (m) of the hash cells (and the default search radius)
+    #length: number of points per fragment
+    def __init__(self, cell=500.0, length=10):
+        self.cell = float(cell)
+        self.length = length
+        self.fragments = []
+        #Start and owner of each fragment (arrays grown by doubling)
+        self._starts = np.empty((64, 2), dtype=np.float64)
+        self._owners = np.empty(64, dtype=object)
+        self.index = {}
+
+    def __len__(self):
+        return len(self.fragments)
+
+    @property
+    def starts(self):
+        return self._starts[:len(self.fragments)]
+
+    @property
+    def owners(self):
+        return self._owners[:len(self.fragments)]
+
+    #Grows the start and owner arrays to hold at least n fragments
+    def _reserve(self, n):
+        if n > len(self._starts):
+            size = max(n, 2*len(self._starts))
+            starts, owners = np.empty((size, 2), dtype=np.float64), np.empty(size, dtype=object)
+            starts[:len(self.fragments)] = self.starts
+            owners[:len(self.fragments)] = self.owners
+            self._starts, self._owners = starts, owners
+
+    #Fragments of a track (N,2): consecutive runs of length points (the last run may be shorter, but has 2 points)
+    def split(self, xy):
+        xy = trackArray.coords(xy)
+        return [xy[i:i+self.length] for i in range(0, len(xy), self.length) if len(xy[i:i+self.length]) > 1]
+
+    #Adds the fragments of one track of owner (incremental insert)
+    def insert(self, xy, owner=None):
+        for fragment in self.split(xy):
+            i = len(self.fragments)
+            self._reserve(i + 1)
+            self._starts[i] = fragment[0]
+            self._owners[i] = owner
+            self.fragments.append(fragment)
+            key = int(grid.cellKeys(grid.cells(fragment[0], self.cell))[0])
+            self.index.setdefault(key, []).append(i)
+
+    #Adds the fragments of many tracks at once (bulk build); owners: owner of each track or None
+    def build(self, tracks, owners=None):
+        first = len(self.fragments)
+        owners = owners if owners is not None else [None]*len(tracks)
+        fragments, fowners = [], []
+        for xy, owner in zip(tracks, owners):
+            split = self.split(xy)
+            fragments.extend(split)
+            fowners.extend([owner]*len(split))
+        starts = np.array([f[0] for f in fragments], dtype=np.float64).reshape(-1, 2)
+        self._reserve(first + len(fragments))
+        self._starts[first:first+len(fragments)] = starts
+        self._owners[first:first+len(fragments)] = fowners
+        self.fragments.extend(fragments)
+        #Group the new fragments by hash cell
+        keys = grid.cellKeys(grid.cells(starts, self.cell))
+        order = np.argsort(keys, kind='stable')
+        ukeys, bounds = np.unique(keys[order], return_index=True)
+        for key, ids in zip(ukeys.tolist(), np.split(order + first, bounds[1:])):
+            self.index.setdefault(key, []).extend(ids.tolist())
+        return self
+
+    #Pool of the tracks of a data frame (track and, if present, person columns; X/Y coordinates in crs, or RDX/RDY)
+    @classmethod
+    def fromFrame(cls, df, cell=500.0, length=10, track='track', owner='person', crs=reproject.WGS84):
+        pool = cls(cell, length)
+        tracks, owners = [], []
+        for t, trackdf in df.groupby(track, sort=False):
+            tracks.append(reproject.rdCoords(trackdf, src=crs) if crs != reproject.RD else trackdf[['X', 'Y']].values)
+            owners.append(trackdf[owner].iloc[0] if owner in trackdf.columns else None)
+        return pool.build(tracks, owners)
+
+    #Fragments starting within radius of xy, other than those of owner
+    def near(self, xy, radius=None, owner=None):
+        radius = self.cell if radius is None else radius
+        ring = int(np.ceil(radius/self.cell))
+        di, dj = np.mgrid[-ring:ring+1, -ring:ring+1]
+        keys = grid.cellKeys(grid.cells(xy, self.cell) + np.column_stack((di.ravel(), dj.ravel())))
+        ids = [i for key in keys.tolist() for i in self.index.get(key, ())]
+        if not ids:
+            return np.zeros(0, dtype=np.int64)
+        ids = np.array(ids, dtype=np.int64)
+        close = np.hypot(*(self.starts[ids] - np.asarray(xy, dtype=np.float64).reshape(2)).T) <= radius
+        if owner is not None:
+            close &= (self._owners[ids] != owner).astype(bool)
+        return ids[close]
+
+    #A random decoy fragment starting within radius of xy (other than those of owner), None if there is none
+    def sample(self, xy, radius=None, owner=None, rng=np.random):
+        ids = self.near(xy, radius, owner)
+        if not len(ids):
+            return None
+        return self.fragments[ids[rng.randint(len(ids))]]
+
+
+#Extends a track of integer cells (grid of m) at its end with up to npoints fake points taken from decoy fragments of other
+#users that start within radius of the current end. Each fragment is snapped to the grid and moved to start at the current
+#end, so that the track continues with the movements of the fragment (cells on the track are skipped). Stops early when
+#no decoy is near, tries fragments in a row add no cell, or the budget (extension.Budget, one evaluation per fragment)
+#is exhausted
+def extendCells(cells, m, pool, npoints, owner=None, radius=None, budget=None, rng=np.random, tries=10):
+    budget = budget if budget is not None else extension.Budget()
+    budget.start(npoints)
+    buf = extension.CellBuffer(cells, capacity=len(cells)+npoints)
+    added = 0
+    failed = 0
+    while added < npoints and failed < tries and budget.spend():
+        fragment = pool.sample(buf.end*float(m), radius, owner, rng)
+        if fragment is None:
+            break
+        failed += 1
+        cells = grid.cells(fragment, m)
+        for cell in buf.end + (cells[1:] - cells[0]):
+            if added == npoints:
+                break
+            if cell not in buf:
+                buf.append(cell)
+                added += 1
+                failed = 0
+    budget.added = added
+    return buf.cells
@@ -28,6 +28,11 @@ from shapely.ops import unary_union
 from random import randint
 from scipy import stats
 
+import corridor
+import landUseRaster
+import layers
+import trackArray
+
 '''
 def gaussianK(size, size_y=None):
     size = int(size)
@@ -55,12 +60,10 @@ def expose(track, concentration, radius, gaussian=False):
 '''
 
 def expo(track, concentration, radius):
-    trackLine = geometry.LineString(track)
-    #create line buffer
-    trackBuffer = trackLine.buffer(radius)
-    stats = zonal_stats(trackBuffer, concentration, 
+    #concentration within a corridor of radius around the track line
+    stats = corridor.corridorStats(track, landUseRaster.loadGrid(concentration), [radius],
                         stats=['min', 'max', 'mean', 'median', 'sum'])
-    return np.array([stats[0]['min'], stats[0]['max'], stats[0]['median'], stats[0]['mean']])  # , stats[0]['sum']/len(track)])
+    return np.array([stats[radius]['min'], stats[radius]['max'], stats[radius]['median'], stats[radius]['mean']])  # , stats[radius]['sum']/len(track)])
 
 def Evaluate(track, trackobf, concentration, lag=50) :
     expo_obf = expo(trackobf, concentration, radius=5)  # Exposure as concentration within 5 meters of buffer
@@ -72,16 +75,17 @@ def Evaluate(track, trackobf, concentration, lag=50) :
 
 
 
+#Tracks are given as in-memory layers or files (see layers.py)
 def evalPres(originaltrack, faketrack, concentration):
 #    originaltrack = 'track.shp'
 #    obfstrack = 'faketrack.shp'
 #    concentration = 'no2small.tif'  # Air pollution map as TIFF file (to be created)
     
-    track = gpd.GeoDataFrame.from_file(originaltrack)
-    trackobf = gpd.GeoDataFrame.from_file(faketrack)
+    track = layers.geometry(originaltrack)
+    trackobf = layers.geometry(faketrack)
 #    concentration = gr.from_file(pollutionmap)  # Air pollution map as distribution concentration
     
-    preserve = Evaluate(track['geometry'], trackobf['geometry'], concentration, lag=30)
+    preserve = Evaluate(track, trackobf, concentration, lag=30)
     return preserve
     
     
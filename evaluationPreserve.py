@@ -29,6 +29,9 @@ from shapely.ops import unary_union
 from random import randint
 from scipy import stats
 
+import layers
+import trackArray
+
 # The Jaccard Index as combined metric of precision and recall
 def jaccard(poly, polypred):
     if poly.intersects(polypred):
@@ -70,8 +73,8 @@ each dimension, and should be greater than 1."""
 # Track precision using the Jaccard Index (as combined measurement of precsion and recall)
 def linePattern(track, trackpred, lag):
     #Create line from track points
-    trackLine = geometry.LineString(track)
-    trackpredLine = geometry.LineString(trackpred)
+    trackLine = geometry.LineString(trackArray.coords(track))
+    trackpredLine = geometry.LineString(trackArray.coords(trackpred))
     #create line buffer
     trackBuffer = Polygon(trackLine.buffer(lag))
     trackpredBuffer = Polygon(trackpredLine.buffer(lag))
@@ -135,7 +138,7 @@ def centroid(cluster):
 
 
 def endPattern(track, home, k=5):
-    track = np.array([[pt.x, pt.y] for ind, pt in np.ndenumerate(track.values)])
+    track = trackArray.coords(track)
     distances, indices = knn(track, k)
     
     #start centroid and end centroid according to distribution of track points
@@ -152,7 +155,7 @@ def eigsorted(cov):
 
 # Draw SDE around p end points of a track 
 def drawEllipse(track, p):
-    track = np.array([[pt.x, pt.y] for ind, pt in np.ndenumerate(track.values)])
+    track = trackArray.coords(track)
     
     x = track[-p:,0].T
     y = track[-p:,1].T
@@ -179,8 +182,8 @@ def ellipsePattern(track, trackpred, p):
     return abs(diffx), abs(diffy), abs(difftheta)
 
 def ellipseFoci(track, trackpred):
-    track = np.array([[pt.x, pt.y] for ind, pt in np.ndenumerate(track.values)])
-    trackpred = np.array([[pt.x, pt.y] for ind, pt in np.ndenumerate(trackpred.values)])
+    track = trackArray.coords(track)
+    trackpred = trackArray.coords(trackpred)
 
     # Draw ellipse of the original track
     x = track[:,0].T
@@ -211,7 +214,7 @@ def vertexDiff(point1, point2):
 def Evaluate(track, trackFake, home, lag=50, p=5):
     
     #Complexity of the original track
-    t = np.array([[pt.x, pt.y] for ind, pt in np.ndenumerate(track.values)])
+    t = trackArray.coords(track)
     t = list([tuple(row)+(0,) for row in t])
     frac = fractaldim(t, 8)
     
@@ -237,13 +240,14 @@ def Evaluate(track, trackFake, home, lag=50, p=5):
 
 
 
+#Tracks are given as in-memory layers or files (see layers.py)
 def evalPreserve(originaltrack, faketrack, home):
 #    originaltrack = 'track.shp'
 #    predictedtrack = 'attacked.shp'
 #    
-    track = gpd.GeoDataFrame.from_file(originaltrack)
-    trackFake = gpd.GeoDataFrame.from_file(faketrack)
-    summary = Evaluate(track['geometry'], trackFake['geometry'], home, lag=50, p=5)
+    track = layers.geometry(originaltrack)
+    trackFake = layers.geometry(faketrack)
+    summary = Evaluate(track, trackFake, home, lag=50, p=5)
     return summary
 
 
@@ -29,6 +29,9 @@ from shapely.ops import unary_union
 from random import randint
 from scipy import stats
 
+import layers
+import trackArray
+
 # The Jaccard Index as combined metric of precision and recall
 def jaccard(poly, polypred):
     if poly.intersects(polypred):
@@ -70,8 +73,8 @@ each dimension, and should be greater than 1."""
 # Track precision using the Jaccard Index (as combined measurement of precsion and recall)
 def linePattern(track, trackpred, lag):
     #Create line from track points
-    trackLine = geometry.LineString(track)
-    trackpredLine = geometry.LineString(trackpred)
+    trackLine = geometry.LineString(trackArray.coords(track))
+    trackpredLine = geometry.LineString(trackArray.coords(trackpred))
     #create line buffer
     trackBuffer = Polygon(trackLine.buffer(lag))
     trackpredBuffer = Polygon(trackpredLine.buffer(lag))
@@ -146,7 +149,7 @@ def eigsorted(cov):
 
 # Draw SDE around p end points of a track 
 def drawEllipse(track, p):
-    track = np.array([[pt.x, pt.y] for ind, pt in np.ndenumerate(track.values)])
+    track = trackArray.coords(track)
     
     x = track[-p:,0].T
     y = track[-p:,1].T
@@ -173,8 +176,8 @@ def ellipsePattern(track, trackpred, p):
     return abs(diffx), abs(diffy), abs(difftheta)
 
 def ellipseFoci(track, trackpred):
-    track = np.array([[pt.x, pt.y] for ind, pt in np.ndenumerate(track.values)])
-    trackpred = np.array([[pt.x, pt.y] for ind, pt in np.ndenumerate(trackpred.values)])
+    track = trackArray.coords(track)
+    trackpred = trackArray.coords(trackpred)
 
     # Draw ellipse of the original track
     x = track[:,0].T
@@ -205,7 +208,7 @@ def vertexDiff(point1, point2):
 def Evaluate(track, trackpred, home, potentialHome, lag=50, p=5):
     
     #Complexity of the original track
-    t = np.array([[pt.x, pt.y] for ind, pt in np.ndenumerate(track.values)])
+    t = trackArray.coords(track)
     t = list([tuple(row)+(0,) for row in t])
     frac = fractaldim(t, 8)
     
@@ -231,13 +234,14 @@ def Evaluate(track, trackpred, home, potentialHome, lag=50, p=5):
 
 
 
+#Tracks are given as in-memory layers or files (see layers.py)
 def evalRecon(originaltrack, predictedtrack, home, potentialHome):
 #    originaltrack = 'track.shp'
 #    predictedtrack = 'attacked.shp'
 #    
-    track = gpd.GeoDataFrame.from_file(originaltrack)
-    trackpred = gpd.GeoDataFrame.from_file(predictedtrack)
-    summary = Evaluate(track['geometry'], trackpred['geometry'], home, potentialHome, lag=50, p=5)
+    track = layers.geometry(originaltrack)
+    trackpred = layers.geometry(predictedtrack)
+    summary = Evaluate(track, trackpred, home, potentialHome, lag=50, p=5)
     return summary
 
 
@@ -0,0 +1,143 @@
+#-------------------------------------------------------------------------------
+# Name:        Track extension
+# Purpose:     Incremental extension (mimic) of a rasterized track on integer grid cells.
+#              Fake points are appended to a preallocated, growable cell buffer with a
+#              hash set of visited cells, and location probabilities are only scored for
+#              cells that have not been scored before. Used by ExtendMimic in
+#              crowding.py and crowdingRaster.py. A Budget bounds the time or the number
+#              of candidate evaluations of an extension (anytime extension).
+#
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+import time
+
+import numpy as np
+
+import grid
+import movement
+
+
+#Growable buffer of integer cells (in units of m) with O(1) append and membership test
+class CellBuffer(object):
+
+    def __init__(self, cells, capacity=None):
+        cells = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+        self._data = np.empty((max(capacity or 0, len(cells), 1), 2), dtype=np.int64)
+        self._data[:len(cells)] = cells
+        self.size = len(cells)
+        self.visited = set(grid.cellKeys(cells).tolist())
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, cell):
+        return int(grid.cellKeys(cell)[0]) in self.visited
+
+    def append(self, cell):
+        if self.size == len(self._data):
+            data = np.empty((2*len(self._data), 2), dtype=np.int64)
+            data[:self.size] = self._data[:self.size]
+            self._data = data
+        self._data[self.size] = cell
+        self.size += 1
+        self.visited.add(int(grid.cellKeys(cell)[0]))
+
+    @property
+    def cells(self):
+        return self._data[:self.size]
+
+    @property
+    def end(self):
+        return self._data[self.size-1]
+
+
+#Location scores of grid cells, computed once per cell with a batched scoring function (cells (N,2) -> scores (N,))
+class CellScores(object):
+
+    def __init__(self, score):
+        self.score = score
+        self.known = {}
+
+    def __call__(self, cells):
+        keys = grid.cellKeys(cells).tolist()
+        missing = [i for i, key in enumerate(keys) if key not in self.known]
+        if missing:
+            for i, s in zip(missing, self.score(cells[missing])):
+                self.known[keys[i]] = s
+        return np.array([self.known[key] for key in keys], dtype=np.float64)
+
+
+#Time (seconds) and work (candidate evaluations) budget of an extension; None: unlimited.
+#Records the progress of the last extension it was used for (report)
+class Budget(object):
+
+    def __init__(self, seconds=None, evaluations=None):
+        self.maxSeconds = seconds
+        self.maxEvaluations = evaluations
+        self.start(0)
+
+    def start(self, requested):
+        self.started = time.perf_counter()
+        self.requested = requested
+        self.added = 0
+        self.evaluations = 0
+        self.elapsed = 0.0
+        self.exhausted = False
+
+    #Continues the budget with another extension pass of requested points (the evaluations and time spent are kept)
+    def resume(self, requested):
+        self.requested = requested
+
+    #Spends n candidate evaluations; False once the budget is exhausted
+    def spend(self, n=1):
+        self.elapsed = time.perf_counter() - self.started
+        if (self.maxEvaluations is not None and self.evaluations + n > self.maxEvaluations) or \
+                (self.maxSeconds is not None and self.elapsed > self.maxSeconds):
+            self.exhausted = True
+        else:
+            self.evaluations += n
+        return not self.exhausted
+
+    def report(self):
+        return {'requested': self.requested, 'added': self.added, 'evaluations': self.evaluations,
+                'elapsed': self.elapsed, 'exhausted': self.exhausted}
+
+
+#Extends a track of integer cells at its end with npoints fake points.
+#In each step, vectors of the movement distribution distr are drawn without replacement, weighted by their movement
+#probability times weights(end) (location weights of the unique vectors), until one leads to a cell not yet on the track
+#(and, with a gate such as trackSimilarity.SimilarityGate, keeps the extended track similar to the original).
+#With a budget, the extension stops when it is exhausted and the track extended so far is returned
+#(every point added so far was accepted); budget.report() tells how many points were added.
+#resume: continue the budget of a previous pass (e.g. decoyPool.extendCells) instead of starting it
+def extendCells(cells, distr, npoints, weights, gate=None, budget=None, resume=False):
+    budget = budget if budget is not None else Budget()
+    if resume:
+        budget.resume(npoints)
+    else:
+        budget.start(npoints)
+    buf = CellBuffer(cells, capacity=len(cells)+npoints)
+    sampler = movement.MoveSampler(distr)
+    for i in range(npoints):
+        if not budget.spend(0):
+            break
+        end = buf.end.copy()
+        error = True
+        #This generates new point candidates based on random choice of relative vectors over movement probability
+        for k in sampler.candidates(weights(end)):
+            if not budget.spend():
+                break
+            candidate = end + distr.keys[k]
+            if candidate not in buf and (gate is None or gate.accepts(end, candidate)):
+                buf.append(candidate)
+                if gate is not None:
+                    gate.append(end, candidate)
+                error = False
+                break
+        if budget.exhausted:
+            break
+        if error:
+            print("Error: no sufficiently similar candidate found!")
+    budget.added = len(buf) - len(cells)
+    return buf.cells
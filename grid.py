@@ -0,0 +1,104 @@
+#-------------------------------------------------------------------------------
+# Name:        Grid
+# Purpose:     Functions for snapping track coordinates to the grid of the rounding
+#              increment m, integer cell ids, and an index from raster cells back
+#              to the original track points (for enriching crowded/masked points).
+#
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+import numpy as np
+
+
+#Integer cell indices (N,2) of coordinates on the grid with rounding increment m
+def cells(xy, m):
+    return np.rint(np.asarray(xy, dtype=np.float64).reshape(-1, 2)/m).astype(np.int64)
+
+
+#Packs integer cell indices (N,2) into one int64 id per cell (for hashing, sorting and set operations)
+def cellKeys(ij):
+    ij = np.asarray(ij, dtype=np.int64).reshape(-1, 2)
+    return (ij[:, 0] << 32) + (ij[:, 1] + (1 << 31))
+
+
+#Inverse of cellKeys
+def keyCells(keys):
+    keys = np.asarray(keys, dtype=np.int64)
+    return np.column_stack((keys >> 32, (keys & 0xffffffff) - (1 << 31)))
+
+
+#Index between the points of a track and the raster cells they fall into.
+#Cells are numbered in order of first occurrence along the track (the order of the rasterized track).
+#inverse:         cell of each original point
+#keys/counts:     cell id and number of original points of each cell
+#indptr/indices:  CSR index, the original points of cell c are indices[indptr[c]:indptr[c+1]]
+class CellIndex(object):
+
+    def __init__(self, keys):
+        keys = np.asarray(keys, dtype=np.int64)
+        ukeys, first, inverse, counts = np.unique(keys, return_index=True, return_inverse=True, return_counts=True)
+        order = np.argsort(first, kind='stable')
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        self.keys = ukeys[order]
+        self.counts = counts[order]
+        self.inverse = rank[inverse.reshape(-1)]
+        self.indptr = np.concatenate(([0], np.cumsum(self.counts)))
+        self.indices = np.argsort(self.inverse, kind='stable')
+        self._sortedkeys = ukeys
+        self._sortedcells = rank
+
+    def __len__(self):
+        return len(self.keys)
+
+    #Original point indices of a cell
+    def points(self, cell):
+        return self.indices[self.indptr[cell]:self.indptr[cell+1]]
+
+    #First original point of each cell
+    @property
+    def first(self):
+        return self.indices[self.indptr[:-1]]
+
+    #Cells of a set of cell ids (e.g. of crowded or masked points), -1 for cells not on the original track
+    def lookup(self, keys):
+        keys = np.asarray(keys, dtype=np.int64)
+        if not len(self._sortedkeys):
+            return np.full(keys.shape, -1, dtype=np.int64)
+        pos = np.searchsorted(self._sortedkeys, keys).clip(0, len(self._sortedkeys)-1)
+        return np.where(self._sortedkeys[pos] == keys, self._sortedcells[pos], -1)
+
+    #Joins an attribute of the original points (e.g. timestamps) onto a set of cell ids.
+    #Each cell gets the value of its first original point, cells not on the original track get fill.
+    def join(self, values, keys, fill=np.nan):
+        values = np.asarray(values)
+        cell = self.lookup(keys)
+        missing = cell < 0
+        if not len(self):
+            return np.full(cell.shape, fill, dtype=object)
+        out = values[self.first[np.maximum(cell, 0)]]
+        if missing.any():
+            if values.dtype.kind == 'M':
+                fill = np.datetime64('NaT')
+            elif values.dtype.kind not in 'fc':
+                out = out.astype(object)
+            out[missing] = fill
+        return out
+
+
+#Rounds coordinates to the grid with rounding increment m.
+#Returns the unique grid coordinates in order of first occurrence and the index of cells to original points.
+def rasterize(xy, m):
+    index = CellIndex(cellKeys(cells(xy, m)))
+    return keyCells(index.keys)*float(m), index
+
+
+#First occurrence of each (group, key) pair, e.g. of the cell ids of several tracks at once (group: track of each cell).
+#Returns the indices of the first occurrences in original order and the number of occurrences of each pair
+def groupFirst(keys, groups):
+    pairs = np.column_stack((np.asarray(groups, dtype=np.int64), np.asarray(keys, dtype=np.int64)))
+    if not len(pairs):
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    unique, first, counts = np.unique(pairs, axis=0, return_index=True, return_counts=True)
+    order = np.argsort(first)
+    return first[order], counts[order]
@@ -0,0 +1,132 @@
+#-------------------------------------------------------------------------------
+# Name:        Grid tracks
+# Purpose:     Compact representation of tracks whose points lie on the grid of the
+#              rounding increment m (rasterized, fake and masked tracks): int32 cell
+#              indices relative to an origin cell, plus the origin and m. Membership,
+#              dedup and equality work on integers (exact, no float comparisons);
+#              float coordinates and shapely points are only created at export
+#              (toGeoSeries, to_file). For storage, tracks can be encoded as int16 (or
+#              int32 if a step does not fit) deltas between consecutive cells.
+#
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+import numpy as np
+import geopandas as gpd
+
+import grid
+
+
+class GridTrack(object):
+
+    #cells:  integer cells (N,2) on the grid of m (absolute, i.e. coordinates/m)
+    #counts: multiplicity of each cell (e.g. of deduplicated masked points), optional
+    def __init__(self, cells, m, counts=None, crs='epsg:28992'):
+        cells = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+        self.m = m
+        self.origin = cells[0].copy() if len(cells) else np.zeros(2, dtype=np.int64)
+        ij = cells - self.origin
+        if len(ij) and np.abs(ij).max() > np.iinfo(np.int32).max:
+            raise ValueError('Track spans more cells than int32 indices can hold')
+        self.ij = ij.astype(np.int32)
+        self.counts = None if counts is None else np.asarray(counts, dtype=np.int32)
+        self.crs = crs
+        self.attrs = {}
+        self._keys = None
+        self._set = None
+
+    #Grid track of coordinates (N,2), snapped to the grid of m
+    @classmethod
+    def fromCoords(cls, xy, m, **kwargs):
+        return cls(grid.cells(xy, m), m, **kwargs)
+
+    #Grid track from its delta encoding (see deltas)
+    @classmethod
+    def fromDeltas(cls, origin, deltas, m, **kwargs):
+        deltas = np.asarray(deltas, dtype=np.int64).reshape(-1, 2)
+        return cls(np.asarray(origin, dtype=np.int64) + np.vstack((np.zeros((1, 2), dtype=np.int64), np.cumsum(deltas, axis=0))), m, **kwargs)
+
+    def __len__(self):
+        return len(self.ij)
+
+    @property
+    def size(self):
+        return len(self.ij)
+
+    #Absolute cells (int64)
+    @property
+    def cells(self):
+        return self.ij.astype(np.int64) + self.origin
+
+    #Packed cell ids (see grid.cellKeys)
+    @property
+    def keys(self):
+        if self._keys is None:
+            self._keys = grid.cellKeys(self.cells)
+        return self._keys
+
+    #Float coordinates (materialized on request)
+    @property
+    def xy(self):
+        return self.cells*float(self.m)
+
+    @property
+    def nbytes(self):
+        return self.ij.nbytes + self.origin.nbytes + (self.counts.nbytes if self.counts is not None else 0)
+
+    def __contains__(self, cell):
+        if self._set is None:
+            self._set = set(self.keys.tolist())
+        return int(grid.cellKeys(cell)[0]) in self._set
+
+    #Membership of many cells (N,2)
+    def contains(self, cells):
+        return np.isin(grid.cellKeys(cells), self.keys)
+
+    #Exact equality: same grid and the same cells in the same order
+    def __eq__(self, other):
+        if not isinstance(other, GridTrack):
+            return NotImplemented
+        return self.m == other.m and np.array_equal(self.cells, other.cells)
+
+    def __ne__(self, other):
+        eq = self.__eq__(other)
+        return eq if eq is NotImplemented else not eq
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'GridTrack('+str(len(self))+' cells, m='+str(self.m)+')'
+
+    #Track moved by an integer offset (in cells)
+    def shift(self, offset):
+        return GridTrack(self.cells + np.asarray(offset, dtype=np.int64).reshape(1, 2), self.m, self.counts, self.crs)
+
+    #Integer movement vectors between consecutive cells
+    def offsets(self):
+        return np.diff(self.ij, axis=0).astype(np.int64)
+
+    #Unique cells in order of first occurrence, with their multiplicity in counts
+    def dedup(self):
+        index = grid.CellIndex(self.keys)
+        return GridTrack(grid.keyCells(index.keys), self.m, index.counts, self.crs)
+
+    #Delta encoding: the origin cell and the steps between consecutive cells, as int16 if every step fits, else int32
+    def deltas(self):
+        steps = self.offsets()
+        small = not len(steps) or np.abs(steps).max() <= np.iinfo(np.int16).max
+        return self.origin.copy(), steps.astype(np.int16 if small else np.int32)
+
+    #Export: shapely points (and counts) with float coordinates
+    def toGeoSeries(self, name='points'):
+        xy = self.xy
+        return gpd.GeoSeries(gpd.points_from_xy(xy[:, 0], xy[:, 1]), name=name, crs=self.crs)
+
+    def toGeoDataFrame(self, geometry='points'):
+        data = {} if self.counts is None else {'count': self.counts}
+        gdf = gpd.GeoDataFrame(data, geometry=self.toGeoSeries().values, crs=self.crs)
+        return gdf.rename_geometry(geometry) if geometry != 'geometry' else gdf
+
+    def to_file(self, *args, **kwargs):
+        self.toGeoDataFrame().to_file(*args, **kwargs)
+
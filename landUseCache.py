@@ -0,0 +1,148 @@
+#-------------------------------------------------------------------------------
+# Name:        Land use cache
+# Purpose:     Two-level cache of the modal land use class within distance lag of
+#              locations. The modal class only depends on the raster pixel a location falls
+#              in, so classes are kept per (lag, pixel): candidates on the grids of different
+#              rounding increments m (one per track) share them within and across tracks.
+#              Level 1 is an in-process LRU of bounded size with hit/miss counters;
+#              level 2 an optional sqlite store next to the raster that survives between
+#              runs and is cleared when the raster file changes. Probabilities depend on
+#              the land use table of a track and are looked up in it per call.
+#
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+import os
+import sqlite3
+from collections import OrderedDict
+
+import numpy as np
+
+import grid
+import landUseRaster
+
+
+#Default number of pixels in the in-process LRU (per process, e.g. per worker of batchCrowding)
+MAXSIZE = 100000
+#Number of keys per sqlite query
+CHUNK = 500
+
+
+#File of the persistent store of a raster (next to the raster file)
+def storePath(land):
+    return os.path.splitext(os.path.abspath(str(land)))[0] + '.luclass.sqlite'
+
+
+#Persistent (lag, pixel) -> modal class store of a raster file, cleared when the raster changes
+class ClassStore(object):
+
+    def __init__(self, path, stamp):
+        self.path = path
+        self.db = sqlite3.connect(path, timeout=60)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)')
+        self.db.execute('CREATE TABLE IF NOT EXISTS pixels (lag REAL, pixel INTEGER, class INTEGER, valid INTEGER, '
+                        'PRIMARY KEY (lag, pixel))')
+        row = self.db.execute("SELECT value FROM meta WHERE name = 'stamp'").fetchone()
+        if row is None or row[0] != stamp:
+            with self.db:
+                #Stores of grid cells per rounding increment (the classes table) are dropped
+                self.db.execute('DROP TABLE IF EXISTS classes')
+                self.db.execute('DELETE FROM pixels')
+                self.db.execute("INSERT OR REPLACE INTO meta VALUES ('stamp', ?)", (stamp,))
+
+    #Stored classes of pixel ids for lag: {pixel: (class, valid)}
+    def get(self, pixels, lag):
+        found = {}
+        pixels = [int(c) for c in pixels]
+        for i in range(0, len(pixels), CHUNK):
+            chunk = pixels[i:i+CHUNK]
+            query = 'SELECT pixel, class, valid FROM pixels WHERE lag = ? AND pixel IN (' + ','.join('?'*len(chunk)) + ')'
+            for pixel, cls, valid in self.db.execute(query, [float(lag)] + chunk):
+                found[pixel] = (cls, bool(valid))
+        return found
+
+    def put(self, pixels, classes, valid, lag):
+        with self.db:
+            self.db.executemany('INSERT OR REPLACE INTO pixels VALUES (?, ?, ?, ?)',
+                                [(float(lag), int(c), int(k), int(v)) for c, k, v in zip(pixels, classes, valid)])
+
+    def close(self):
+        self.db.close()
+
+
+#Modal land use classes of locations on a land use grid (landUseRaster.LandUseGrid), per raster pixel, through an LRU of
+#maxsize pixels and, if store is given (a ClassStore), the persistent store
+class ClassCache(object):
+
+    def __init__(self, land, maxsize=MAXSIZE, store=None):
+        self.land = land
+        self.maxsize = maxsize
+        self.store = store
+        self.lru = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.storeHits = 0
+
+    def stats(self):
+        return {'size': len(self.lru), 'hits': self.hits, 'misses': self.misses, 'storeHits': self.storeHits}
+
+    #Modal class within lag of the centres of integer cells (N,2) of the grid of m, and a mask of cells with valid land use
+    #(as LandUseGrid.modeClass of cells*m)
+    def modeClass(self, cells, m, lag):
+        return self.modeClassAt(np.asarray(cells, dtype=np.int64).reshape(-1, 2)*float(m), lag)
+
+    #Modal class within lag of locations (N,2), and a mask of locations with valid land use (as LandUseGrid.modeClass)
+    def modeClassAt(self, xy, lag):
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        keys = grid.cellKeys(np.column_stack(self.land.rowcol(xy))).tolist()
+        classes = np.zeros(len(keys), dtype=self.land.data.dtype)
+        valid = np.zeros(len(keys), dtype=bool)
+        missing = []
+        for i, key in enumerate(keys):
+            entry = self.lru.get((lag, key))
+            if entry is None:
+                missing.append(i)
+                continue
+            self.lru.move_to_end((lag, key))
+            classes[i], valid[i] = entry
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            stored = self.store.get(set(keys[i] for i in missing), lag) if self.store is not None else {}
+            self.storeHits += sum(1 for i in missing if keys[i] in stored)
+            #One location per pixel (locations in the same pixel have the same modal class)
+            compute = list({keys[i]: i for i in missing if keys[i] not in stored}.values())
+            if compute:
+                mode, ok = self.land.modeClass(xy[compute], lag)
+                for i, cls, v in zip(compute, mode.tolist(), ok.tolist()):
+                    stored[keys[i]] = (cls, v)
+                if self.store is not None:
+                    self.store.put([keys[i] for i in compute], mode, ok, lag)
+            for i in missing:
+                classes[i], valid[i] = stored[keys[i]]
+                self.lru[(lag, keys[i])] = stored[keys[i]]
+            while len(self.lru) > self.maxsize:
+                self.lru.popitem(last=False)
+        return classes, valid
+
+    #Land use probabilities of integer cells in a class -> probability table (as crowdingRaster.getLUProbs)
+    def probs(self, cells, m, lag, table, default=0.05):
+        classes, valid = self.modeClass(cells, m, lag)
+        return landUseRaster.tableProbs(classes, valid, table, default=default)
+
+
+#Returns the class cache of a land use raster (file or grid, see landUseRaster.loadGrid), kept with the grid (once per
+#process and raster version). store: keep a persistent store next to the raster file (True) or at a path
+def loadCache(land, store=None, maxsize=MAXSIZE):
+    landgrid = landUseRaster.loadGrid(land)
+    cache = getattr(landgrid, 'classCache', None)
+    if cache is None:
+        cache = landgrid.classCache = ClassCache(landgrid, maxsize)
+    if store and cache.store is None:
+        path = os.path.abspath(str(landgrid.path))
+        st = os.stat(path)
+        #The store is cleared when the raster file changes or a grid of another resolution is stored
+        stamp = ':'.join(str(v) for v in ('pixel', st.st_mtime, st.st_size) + tuple(landgrid.transform)[:6] + landgrid.shape)
+        cache.store = ClassStore(storePath(path) if store is True else str(store), stamp)
+    return cache
@@ -0,0 +1,220 @@
+#-------------------------------------------------------------------------------
+# Name:        Land use index
+# Purpose:     Spatial index over the parcels of a vector land use layer (e.g.
+#              sampleLandUse.shp) for the vector crowding engine. The index is built
+#              once per layer and process, optionally persisted next to the shapefile
+#              (parcel geometries as WKB with their classes, reloaded while the shapefile
+#              is unchanged), and queried for many buffered candidate locations at once
+#              with a shapely STRtree and true intersection tests.
+#
+#              For raster speed lookups, the layer can be rasterized to an in-memory
+#              categorical grid (landUseRaster.LandUseGrid, class codes kept) at a chosen
+#              resolution. parityReport compares the rasterized lookups to the exact polygon
+#              lookups, to choose the resolution:
+#                  python landUseIndex.py sampleLandUse.shp 50 5 10 25
+#
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+from rasterio import features
+from rasterio.transform import from_origin
+
+import landUseRaster
+
+
+#Land use class attribute of the parcels
+FIELD = 'BG2010'
+
+
+#File of the persisted index of a layer (next to the shapefile)
+def indexPath(layer):
+    return os.path.splitext(os.path.abspath(str(layer)))[0] + '.luindex.npz'
+
+
+class LandUseIndex(object):
+
+    def __init__(self, geoms, classes, path=None):
+        self.geoms = np.asarray(geoms)
+        self.classes = np.asarray(classes)
+        self.path = path
+        self.tree = shapely.STRtree(self.geoms)
+
+    @classmethod
+    def fromFrame(cls, land, field=FIELD, path=None):
+        land = land[land.geometry.notna()]
+        return cls(np.asarray(land.geometry.values), land[field].values, path)
+
+    @classmethod
+    def fromFile(cls, layer, field=FIELD):
+        return cls.fromFrame(gpd.GeoDataFrame.from_file(str(layer)), field, os.path.abspath(str(layer)))
+
+    #Writes the index next to the shapefile, stamped with the version of the shapefile it was built from. The file holds
+    #plain arrays only (the WKB of the parcels concatenated into bytes with their offsets, classes as numbers or text),
+    #so that it is read without unpickling
+    def save(self, path=None):
+        st = os.stat(self.path)
+        wkb = shapely.to_wkb(self.geoms)
+        offsets = np.zeros(len(wkb)+1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(b) for b in wkb])
+        classes = self.classes if self.classes.dtype.kind in 'biuf' else self.classes.astype(str)
+        np.savez(path or indexPath(self.path), wkb=np.frombuffer(b''.join(wkb), dtype=np.uint8), offsets=offsets,
+                 classes=classes, stamp=np.array([st.st_mtime, st.st_size]))
+
+    #Reads the persisted index of a layer; None if there is none, the shapefile has changed since or the file is not
+    #an index of plain arrays (pickled objects are never loaded)
+    @classmethod
+    def load(cls, layer, path=None):
+        path = path or indexPath(layer)
+        if not os.path.exists(path):
+            return None
+        st = os.stat(str(layer))
+        try:
+            with np.load(path, allow_pickle=False) as f:
+                if tuple(f['stamp']) != (st.st_mtime, st.st_size):
+                    return None
+                wkb, offsets = f['wkb'].tobytes(), f['offsets']
+                geoms = shapely.from_wkb(np.array([wkb[a:b] for a, b in zip(offsets[:-1], offsets[1:])], dtype=object))
+                return cls(geoms, f['classes'], os.path.abspath(str(layer)))
+        except (ValueError, KeyError) as e:
+            print('land use index not loaded: '+str(e))
+            return None
+
+    #Categorical grid of the parcels with cell size res (cells get the class of the parcel covering their centre;
+    #nodata where there is none)
+    def rasterize(self, res):
+        xmin, ymin, xmax, ymax = shapely.total_bounds(self.geoms)
+        x0, y0 = np.floor(xmin/res)*res, np.ceil(ymax/res)*res
+        w, h = max(int(np.ceil((xmax - x0)/res)), 1), max(int(np.ceil((y0 - ymin)/res)), 1)
+        classes = self.classes.astype(np.int64)
+        if len(classes) and (classes.min() < 0 or classes.max() >= 255):
+            dtype, nodata = np.int32, -1
+        else:
+            dtype, nodata = np.uint8, 255
+        transform = from_origin(x0, y0, res, res)
+        data = features.rasterize(zip(self.geoms, classes.tolist()), out_shape=(h, w), transform=transform,
+                                  fill=nodata, dtype=dtype)
+        return landUseRaster.LandUseGrid(data, transform, nodata, self.path)
+
+    #Parcels intersecting a geometry, with their intersections (one intersection per candidate parcel of the tree)
+    def overlay(self, geom):
+        parcel = self.tree.query(geom, predicate='intersects')
+        pieces = shapely.intersection(geom, self.geoms[parcel])
+        return parcel, pieces, shapely.area(pieces)
+
+    #Area of each land use class (class -> area) within a geometry
+    def areas(self, geom):
+        parcel, pieces, area = self.overlay(geom)
+        classes, inv = np.unique(self.classes[parcel], return_inverse=True)
+        total = np.bincount(inv.reshape(-1), weights=area, minlength=len(classes))
+        return dict(zip(classes.tolist(), total.tolist()))
+
+    #Land use class of each location (N,2) within distance lag: the class with the largest area intersecting the disk
+    #of radius lag (lag 0: the parcel containing the location). Locations on no parcel get missing
+    def query(self, xy, lag, missing=None):
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        points = shapely.points(xy)
+        out = np.full(len(xy), missing, dtype=object)
+        if not len(xy) or not len(self.geoms):
+            return out
+        if not lag:
+            loc, parcel = self.tree.query(points, predicate='intersects')
+            order = np.unique(loc, return_index=True)[1]
+            out[loc[order]] = self.classes[parcel[order]]
+            return out
+        disks = shapely.buffer(points, lag)
+        loc, parcel = self.tree.query(disks, predicate='intersects')
+        if not len(loc):
+            return out
+        area = shapely.area(shapely.intersection(disks[loc], self.geoms[parcel]))
+        #Total area of each class per location, then the largest class per location
+        classes, cinv = np.unique(self.classes[parcel], return_inverse=True)
+        pairs, pinv = np.unique(loc*len(classes) + cinv.reshape(-1), return_inverse=True)
+        total = np.bincount(pinv.reshape(-1), weights=area)
+        ploc = pairs//len(classes)
+        order = np.lexsort((-total, ploc))
+        first = order[np.r_[True, ploc[order][1:] != ploc[order][:-1]]]
+        out[ploc[first]] = classes[pairs[first] % len(classes)]
+        return out
+
+
+#Land use indices loaded in this process, by path
+_indices = {}
+
+
+#Returns the land use index of a layer (built once per process and shapefile version; persisted next to the
+#shapefile if persist), or the index itself
+def loadIndex(layer, persist=True):
+    if isinstance(layer, LandUseIndex):
+        return layer
+    path = os.path.abspath(str(layer))
+    key = (path, os.path.getmtime(path))
+    if key not in _indices:
+        for old in [k for k in _indices if k[0] == path]:
+            del _indices[old]
+        index = LandUseIndex.load(path)
+        if index is None:
+            index = LandUseIndex.fromFile(path)
+            if persist:
+                try:
+                    index.save()
+                except OSError as e:
+                    print('land use index not saved: '+str(e))
+        _indices[key] = index
+    return _indices[key]
+
+
+#Rasterized land use layers loaded in this process, by path and resolution
+_grids = {}
+
+
+#Returns the land use layer rasterized with cell size res (once per process, shapefile version and resolution)
+def loadGrid(layer, res=10, persist=True):
+    path = os.path.abspath(str(layer))
+    key = (path, os.path.getmtime(path), float(res))
+    if key not in _grids:
+        for old in [k for k in _grids if k[0] == path and k[1] != key[1]]:
+            del _grids[old]
+        _grids[key] = loadIndex(path, persist).rasterize(res)
+    return _grids[key]
+
+
+#Agreement of the rasterized lookups (modal class of the cells within lag) with the exact polygon lookups
+#(class of the largest area within lag) at n random locations within the layer, for each resolution
+def parityReport(layer, lag, resolutions=(5, 10, 25), n=2000, seed=0):
+    index = loadIndex(layer)
+    xmin, ymin, xmax, ymax = shapely.total_bounds(index.geoms)
+    xy = np.random.RandomState(seed).uniform((xmin, ymin), (xmax, ymax), (n, 2))
+    start = time.perf_counter()
+    exact = index.query(xy, lag)
+    exactTime = time.perf_counter() - start
+    onLayer = np.array([c is not None for c in exact])
+    rows = []
+    for res in resolutions:
+        start = time.perf_counter()
+        grid = loadGrid(layer, res)
+        buildTime = time.perf_counter() - start
+        start = time.perf_counter()
+        classes, valid = grid.modeClass(xy, lag)
+        lookupTime = time.perf_counter() - start
+        same = valid & onLayer & (classes.astype(object) == exact)
+        rows.append({'resolution': res, 'cells': grid.data.size, 'agreement': same.sum()/float(max(onLayer.sum(), 1)),
+                     'coverage': (valid == onLayer).mean(), 'build': buildTime, 'lookup': lookupTime, 'exact': exactTime})
+    return pd.DataFrame(rows)
+
+
+def main():
+    layer, lag = sys.argv[1], float(sys.argv[2])
+    resolutions = [float(res) for res in sys.argv[3:]] or [5.0, 10.0, 25.0]
+    print(parityReport(layer, lag, resolutions).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
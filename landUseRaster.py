@@ -0,0 +1,339 @@
+#-------------------------------------------------------------------------------
+# Name:        Land use raster
+# Purpose:     In-memory raster grids for land use lookups during crowding.
+#              The land use map is read once into a NumPy array, and the modal land use
+#              class within distance lag of many candidate locations is scored in one
+#              vectorized call with a precomputed disk kernel (instead of one
+#              zonal_stats call per candidate).
+#
+#              For fixed lags, focal mode and class fraction rasters can be precomputed
+#              offline (buildFocal) and are then memory-mapped, so lookups become array indexing:
+#                  python landUseRaster.py landUse.tif 30 50
+#
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+import os
+import sys
+import json
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+from scipy import ndimage
+from concurrent.futures import ProcessPoolExecutor
+
+
+#Mask of values that are not nodata
+def validMask(values, nodata):
+    valid = np.ones(values.shape, dtype=bool)
+    if nodata is not None:
+        valid &= values != nodata
+    if values.dtype.kind == 'f':
+        valid &= ~np.isnan(values)
+    return valid
+
+
+#Boolean footprint of the cells whose centres lie within distance lag of the centre cell, for cell size res=(x,y)
+def diskFootprint(lag, res):
+    resx, resy = res
+    ri, ci = int(np.ceil(lag/resy)), int(np.ceil(lag/resx))
+    di, dj = np.mgrid[-ri:ri+1, -ci:ci+1]
+    return (di*resy)**2 + (dj*resx)**2 <= lag**2
+
+
+#A single raster band held in memory, with its affine transform and nodata value
+class RasterGrid(object):
+
+    def __init__(self, data, transform, nodata=None, path=None):
+        self.data = data
+        self.transform = transform
+        self.nodata = nodata
+        self.path = path
+
+    @classmethod
+    def fromFile(cls, path, band=1):
+        with rasterio.open(path) as src:
+            return cls(src.read(band), src.transform, src.nodata, str(path))
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    #Cell size in x and y
+    @property
+    def res(self):
+        return abs(self.transform.a), abs(self.transform.e)
+
+    #Row and column of the cells containing coordinates (N,2); may lie outside the raster
+    def rowcol(self, xy):
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        t = self.transform
+        cols = np.floor((xy[:, 0] - t.c)/t.a).astype(np.int64)
+        rows = np.floor((xy[:, 1] - t.f)/t.e).astype(np.int64)
+        return rows, cols
+
+    #Mask of cell indices inside the raster
+    def inside(self, rows, cols):
+        h, w = self.data.shape
+        return (rows >= 0) & (rows < h) & (cols >= 0) & (cols < w)
+
+    #Values at cell indices, together with a mask of cells inside the raster and not nodata
+    def sample(self, rows, cols):
+        h, w = self.data.shape
+        inside = self.inside(rows, cols)
+        values = self.data[rows.clip(0, h-1), cols.clip(0, w-1)]
+        return values, inside & validMask(values, self.nodata)
+
+
+#Land use raster with vectorized modal class lookups in a disk around candidate locations
+class LandUseGrid(RasterGrid):
+
+    def __init__(self, data, transform, nodata=None, path=None):
+        RasterGrid.__init__(self, data, transform, nodata, path)
+        self._kernels = {}
+        self.focal = {}
+
+    #Row/column offsets of the cells whose centres lie within distance lag of the centre cell
+    def kernel(self, lag):
+        if lag not in self._kernels:
+            footprint = diskFootprint(lag, self.res)
+            di, dj = np.nonzero(footprint)
+            self._kernels[lag] = (di - footprint.shape[0]//2, dj - footprint.shape[1]//2)
+        return self._kernels[lag]
+
+    #Attaches the precomputed focal rasters of buildFocal, if they were built from this version of the raster file
+    def attachFocal(self, outdir=None):
+        manifest = readManifest(self.path, outdir)
+        if manifest is not None:
+            for entry in manifest['lags']:
+                self.focal[float(entry['lag'])] = FocalLayer(manifest, entry)
+        return self
+
+    #Counts of each land use class within distance lag of each location (none for locations outside the raster).
+    #Returns the classes (C,) and the counts (N,C)
+    def classCounts(self, xy, lag):
+        rows, cols = self.rowcol(xy)
+        di, dj = self.kernel(lag)
+        values, valid = self.sample(rows[:, None] + di[None, :], cols[:, None] + dj[None, :])
+        valid &= self.inside(rows, cols)[:, None]
+        classes, inverse = np.unique(values[valid], return_inverse=True)
+        owner = np.nonzero(valid)[0]
+        counts = np.bincount(owner*len(classes) + inverse.reshape(-1), minlength=len(rows)*len(classes))
+        return classes, counts.reshape(len(rows), len(classes))
+
+    #Most frequent land use class within distance lag of each location.
+    #Returns the modal classes and a mask of locations with any valid land use (outside the raster or nodata: False)
+    def modeClass(self, xy, lag):
+        if float(lag) in self.focal:
+            return self.focal[float(lag)].modeAt(*self.rowcol(xy))
+        classes, counts = self.classCounts(xy, lag)
+        valid = counts.sum(axis=1) > 0
+        if not len(classes):
+            return np.zeros(len(counts), dtype=self.data.dtype), valid
+        return classes[counts.argmax(axis=1)], valid
+
+    #Fraction of the cells within distance lag of each location that have land use class cls
+    def classFraction(self, xy, lag, cls):
+        focal = self.focal.get(float(lag))
+        if focal is not None and focal.fractions is not None:
+            return focal.fractionAt(cls, *self.rowcol(xy))
+        classes, counts = self.classCounts(xy, lag)
+        total = counts.sum(axis=1)
+        if cls not in classes:
+            return np.zeros(len(counts))
+        return counts[:, np.searchsorted(classes, cls)]/np.maximum(total, 1).astype(np.float64)
+
+
+#Precomputed focal mode (and class fraction) rasters for one lag, memory-mapped from the .npy files of buildFocal
+class FocalLayer(object):
+
+    def __init__(self, manifest, entry):
+        folder = manifest['folder']
+        self.lag = entry['lag']
+        self.fill = manifest['fill']
+        self.classes = np.array(manifest['classes'])
+        self.mode = np.load(os.path.join(folder, entry['mode']), mmap_mode='r')
+        self.fractions = None
+        if entry.get('fractions'):
+            self.fractions = np.load(os.path.join(folder, entry['fractions']), mmap_mode='r')
+
+    def modeAt(self, rows, cols):
+        h, w = self.mode.shape
+        inside = (rows >= 0) & (rows < h) & (cols >= 0) & (cols < w)
+        mode = np.asarray(self.mode[rows.clip(0, h-1), cols.clip(0, w-1)])
+        return mode, inside & (mode != self.fill)
+
+    def fractionAt(self, cls, rows, cols):
+        h, w = self.mode.shape
+        inside = (rows >= 0) & (rows < h) & (cols >= 0) & (cols < w)
+        if cls not in self.classes:
+            return np.zeros(len(rows))
+        frac = np.asarray(self.fractions[np.searchsorted(self.classes, cls), rows.clip(0, h-1), cols.clip(0, w-1)], dtype=np.float64)
+        return np.where(inside, frac, 0.0)
+
+
+#Default folder of the focal rasters of a land use raster (next to the raster file)
+def focalDir(land):
+    return os.path.splitext(os.path.abspath(str(land)))[0] + '.focal'
+
+
+#Identifies the version of a raster file the focal rasters were built from
+def sourceStamp(land):
+    st = os.stat(str(land))
+    return {'path': os.path.abspath(str(land)), 'mtime': st.st_mtime, 'size': st.st_size}
+
+
+#Reads the manifest of the focal rasters of a land use raster; None if there are none or they are outdated
+def readManifest(land, outdir=None):
+    if land is None:
+        return None
+    outdir = outdir or focalDir(land)
+    path = os.path.join(outdir, 'manifest.json')
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        manifest = json.load(f)
+    stamp = sourceStamp(land)
+    if (manifest['source']['mtime'], manifest['source']['size']) != (stamp['mtime'], stamp['size']):
+        return None
+    #Focal rasters whose fill value is a valid class (built without a sentinel) are outdated
+    if manifest['fill'] in manifest['classes']:
+        return None
+    manifest['folder'] = outdir
+    return manifest
+
+
+#Fill value of the focal mode raster where there is no valid land use within lag, and its dtype: the nodata value of
+#the raster, else a value outside the classes (-1, or the largest value of unsigned types; the type is widened if every
+#value is a class), so that no valid class is taken for nodata
+def focalFill(classes, dtype, nodata=None):
+    dtype = np.dtype(dtype)
+    if nodata is not None:
+        return nodata, dtype
+    if dtype.kind == 'f':
+        return dtype.type(-1) if -1 not in classes else dtype.type(np.finfo(dtype).min), dtype
+    info = np.iinfo(dtype)
+    for fill in (-1, info.max, info.min):
+        if info.min <= fill <= info.max and fill not in classes:
+            return dtype.type(fill), dtype
+    return np.int64(-1), np.dtype(np.int64)
+
+
+#Computes focal mode and class fractions for one tile of the raster (run in worker processes)
+def _focalTile(args):
+    land, lag, (r0, r1, c0, c1), classes, fill = args
+    with rasterio.open(land) as src:
+        h, w = src.height, src.width
+        footprint = diskFootprint(lag, src.res)
+        hr, hc = footprint.shape[0]//2, footprint.shape[1]//2
+        R0, R1, C0, C1 = max(r0-hr, 0), min(r1+hr, h), max(c0-hc, 0), min(c1+hc, w)
+        data = src.read(1, window=Window(C0, R0, C1-C0, R1-R0))
+        valid = validMask(data, src.nodata)
+    #Pad the tile with invalid cells where the halo leaves the raster
+    pad = ((hr-(r0-R0), hr-(R1-r1)), (hc-(c0-C0), hc-(C1-c1)))
+    data = np.pad(data, pad, mode='edge')
+    valid = np.pad(valid, pad, mode='constant', constant_values=False)
+    counts = np.empty((len(classes), r1-r0, c1-c0), dtype=np.int32)
+    for i, cls in enumerate(classes):
+        counts[i] = ndimage.correlate(((data == cls) & valid).astype(np.int32), footprint.astype(np.int32), mode='constant', cval=0)[hr:hr+r1-r0, hc:hc+c1-c0]
+    total = counts.sum(axis=0)
+    mode = np.where(total > 0, np.asarray(classes)[counts.argmax(axis=0)], fill)
+    fractions = (counts/np.maximum(total, 1)).astype(np.float32)
+    return (r0, r1, c0, c1), mode, fractions
+
+
+#Precomputes focal mode and per-class focal fraction rasters of a land use raster for a list of lags.
+#The raster is processed in tiles across worker processes; results are stored as .npy files (memory-mapped on use,
+#optionally also as GeoTIFF) in outdir together with a manifest.json. Returns the manifest.
+def buildFocal(land, lags, outdir=None, tile=1024, workers=None, fractions=True, geotiff=False):
+    land = os.path.abspath(str(land))
+    outdir = outdir or focalDir(land)
+    if not os.path.exists(outdir):
+        os.makedirs(outdir)
+    grid = LandUseGrid.fromFile(land)
+    h, w = grid.shape
+    classes = np.unique(grid.data[validMask(grid.data, grid.nodata)])
+    fill, dtype = focalFill(classes, grid.data.dtype, grid.nodata)
+    tiles = [(r, min(r+tile, h), c, min(c+tile, w)) for r in range(0, h, tile) for c in range(0, w, tile)]
+    manifest = {'source': sourceStamp(land), 'shape': [h, w], 'transform': list(grid.transform)[:6],
+                'fill': fill.item() if hasattr(fill, 'item') else fill, 'classes': classes.tolist(), 'lags': []}
+    for lag in lags:
+        print('computing focal rasters for lag '+str(lag))
+        entry = {'lag': lag, 'mode': 'mode_%g.npy' % lag, 'fractions': None}
+        mode = np.lib.format.open_memmap(os.path.join(outdir, entry['mode']), mode='w+', dtype=dtype, shape=(h, w))
+        frac = None
+        if fractions:
+            entry['fractions'] = 'fractions_%g.npy' % lag
+            frac = np.lib.format.open_memmap(os.path.join(outdir, entry['fractions']), mode='w+', dtype=np.float32, shape=(len(classes), h, w))
+        with ProcessPoolExecutor(workers) as pool:
+            for (r0, r1, c0, c1), tmode, tfrac in pool.map(_focalTile, [(land, lag, t, classes, fill) for t in tiles]):
+                mode[r0:r1, c0:c1] = tmode
+                if frac is not None:
+                    frac[:, r0:r1, c0:c1] = tfrac
+        mode.flush()
+        if frac is not None:
+            frac.flush()
+        if geotiff:
+            entry['geotiff'] = 'mode_%g.tif' % lag
+            with rasterio.open(land) as src:
+                profile = src.profile
+            profile.update(driver='GTiff', dtype=dtype.name, nodata=fill)
+            with rasterio.open(os.path.join(outdir, entry['geotiff']), 'w', **profile) as dst:
+                dst.write(np.asarray(mode), 1)
+        manifest['lags'].append(entry)
+    with open(os.path.join(outdir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+#Land use grids loaded in this process, by path
+_grids = {}
+
+
+#Returns the land use grid of a raster file (read once per process and file version), or the grid itself
+def loadGrid(land):
+    if isinstance(land, RasterGrid):
+        return land
+    path = os.path.abspath(str(land))
+    key = (path, os.path.getmtime(path))
+    if key not in _grids:
+        for old in [k for k in _grids if k[0] == path]:
+            del _grids[old]
+        _grids[key] = LandUseGrid.fromFile(path).attachFocal()
+    return _grids[key]
+
+
+#Registers a grid loaded in another way (e.g. attached from shared memory) as the grid of its raster file
+def registerGrid(grid):
+    path = os.path.abspath(str(grid.path))
+    for old in [k for k in _grids if k[0] == path]:
+        del _grids[old]
+    _grids[(path, os.path.getmtime(path))] = grid
+    return grid
+
+
+#Looks up the probability of land use classes in a class->probability table.
+#Classes missing from the table get default, invalid (masked) locations get masked.
+def tableProbs(classes, valid, table, default=0.05, masked=0.0):
+    classes = np.asarray(classes)
+    probs = np.full(len(classes), default, dtype=np.float64)
+    if len(table):
+        keys = np.array(list(table.keys()))
+        values = np.array(list(table.values()), dtype=np.float64)
+        order = np.argsort(keys)
+        keys, values = keys[order], values[order]
+        pos = np.searchsorted(keys, classes).clip(0, len(keys)-1)
+        found = keys[pos] == classes
+        probs[found] = values[pos[found]]
+    probs[~np.asarray(valid)] = masked
+    return probs
+
+
+def main():
+    land = sys.argv[1]
+    lags = [float(lag) for lag in sys.argv[2:]] or [30.0, 50.0]
+    buildFocal(land, lags)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+#-------------------------------------------------------------------------------
+# Name:        Layers
+# Purpose:     Passing intermediate tracks between crowding, masking, attacking and
+#              evaluation in memory, with an optional sink where layers are also saved.
+#              A sink is None (nothing is written), a directory, or a GDAL /vsimem/
+#              path (in-memory file system), so that several tracks can be processed
+#              concurrently without sharing fixed file names.
+#
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+import os
+
+import geopandas as gpd
+
+import gridTrack
+
+
+#Path of a named layer in a sink (None if the sink does not save layers)
+def layerPath(name, sink):
+    if sink is None:
+        return None
+    sink = str(sink)
+    if sink.startswith('/vsimem/'):
+        return sink.rstrip('/') + '/' + name + '.shp'
+    os.makedirs(sink, exist_ok=True)
+    return os.path.join(sink, name + '.shp')
+
+
+#Saves a layer (GeoDataFrame, GeoSeries or grid track) as a shapefile in the sink. Returns the layer itself
+def writeLayer(layer, name, sink=None):
+    path = layerPath(name, sink)
+    if path is not None:
+        layer.to_file(driver = 'ESRI Shapefile', filename = path)
+    return layer
+
+
+#Reads a layer given as a GeoDataFrame, a GeoSeries, a grid track (its points are created here) or a file path
+#(e.g. a shapefile written to a sink)
+def readLayer(layer):
+    if isinstance(layer, (gpd.GeoDataFrame, gpd.GeoSeries)):
+        return layer
+    if isinstance(layer, gridTrack.GridTrack):
+        return layer.toGeoSeries()
+    return gpd.GeoDataFrame.from_file(str(layer))
+
+
+#Point geometries of a layer (GeoDataFrame, GeoSeries, grid track or file path)
+def geometry(layer):
+    layer = readLayer(layer)
+    if isinstance(layer, gpd.GeoSeries):
+        return layer
+    return layer.geometry
@@ -0,0 +1,101 @@
+#-------------------------------------------------------------------------------
+# Name:        Template masking
+# Purpose:     Array based template masking of rasterized tracks on integer grid cells.
+#              The von Neumann template, its shift probabilities and all shifted templates
+#              are precomputed once per radius r; the shifts for a whole track are drawn in
+#              one call and the masks are built by broadcasting. Exclusion of the previous
+#              mask is done on integer cells. Used by Masking in crowding.py and crowdingRaster.py.
+#
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+import numpy as np
+
+import grid
+
+
+#Von Neumann neighborhood template with radius r as integer offsets (T,2), in the order of vNTemplate
+def vNOffsets(r):
+    return np.array([(x, y) for x in range(-r, r+1) for y in range(-r, r+1) if abs(x) + abs(y) <= r], dtype=np.int64).reshape(-1, 2)
+
+
+#Probabilities of shifting the template centre to each template cell. Prefers points at the periphery of the template
+def shiftProbs(template):
+    templatedistances = np.abs(template).max(axis=1) + 1.0
+    return templatedistances/templatedistances.sum()
+
+
+class TemplateMasker(object):
+
+    def __init__(self, r):
+        self.r = r
+        self.template = vNOffsets(r)
+        self.probs = shiftProbs(self.template)
+        #All shifted templates: shifted[s] is the template with its centre moved to template cell s
+        self.shifted = self.template[None, :, :] - self.template[:, None, :]
+        #Template cell of an offset in [-r, r]^2 (-1 outside the template)
+        self.lut = np.full((2*r+1, 2*r+1), -1, dtype=np.int64)
+        self.lut[self.template[:, 0] + r, self.template[:, 1] + r] = np.arange(len(self.template))
+
+    #Masks each cell (N,2) of a track with a randomly shifted template. Template cells that were in the mask of the
+    #previous point are left out; prev optionally gives the mask preceding the first cell (to continue a track).
+    #starts optionally marks cells that start a new track (several tracks masked at once), where the chain restarts.
+    #shift optionally gives the template shift of each cell (see shifts), else they are drawn from rng.
+    #Returns the masked cells (M,2), the index of the track cell each masked cell belongs to, and the last mask
+    def mask(self, cells, prev=None, rng=np.random, starts=None, shift=None):
+        cells = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+        n, t, r = len(cells), len(self.template), self.r
+        if not n:
+            return np.zeros((0, 2), dtype=np.int64), np.zeros(0, dtype=np.int64), prev
+        shift = self.shifts(n, rng) if shift is None else np.asarray(shift)
+        candidates = cells[:, None, :] + self.shifted[shift]
+        #Candidates equal to the previous track cell
+        notprev = ~(candidates[1:] == cells[:-1, None, :]).all(axis=2)
+        #Position of each candidate in the shifted template of the previous cell (-1 if not in it)
+        delta = (cells[1:] - self.template[shift[1:]]) - (cells[:-1] - self.template[shift[:-1]])
+        offset = self.template[None, :, :] + delta[:, None, :]
+        inrange = (np.abs(offset) <= r).all(axis=2)
+        match = np.where(inrange, self.lut[offset[..., 0].clip(-r, r) + r, offset[..., 1].clip(-r, r) + r], -1)
+        keep = np.ones((n, t), dtype=bool)
+        if prev is not None and len(prev):
+            keep[0] = ~np.isin(grid.cellKeys(candidates[0]), grid.cellKeys(prev))
+        for i in range(1, n):
+            if starts is not None and starts[i]:
+                continue
+            keep[i] = notprev[i-1] & ~((match[i-1] >= 0) & keep[i-1][match[i-1].clip(0)])
+        #Mask: remaining candidates followed by the cell itself
+        masks = np.concatenate((candidates, cells[:, None, :]), axis=1)
+        keep = np.concatenate((keep, np.ones((n, 1), dtype=bool)), axis=1)
+        owner = np.broadcast_to(np.arange(n)[:, None], keep.shape)
+        return masks[keep], owner[keep], masks[-1][keep[-1]]
+
+    #Random template shifts (template cell moved to the centre) of n cells
+    def shifts(self, n, rng=np.random):
+        return rng.choice(len(self.template), n, p=self.probs)
+
+    #Continues the mask prev with a track that was masked on its own (out, owner of mask(cells, shift=shift), e.g. a
+    #segment of a track masked in another process), as mask(cells, prev, shift=shift) would have masked it. The leading
+    #cells are masked again until their masks agree with those masked on their own (the chain is the same from there).
+    #Returns the masked cells, their owners and the last mask
+    def resume(self, cells, out, owner, shift, prev):
+        n = len(cells)
+        if not n:
+            return out, owner, prev
+        last = out[owner == n-1]
+        if prev is None or not len(prev):
+            return out, owner, last
+        size = 1
+        while size < n:
+            head, headowner, headlast = self.mask(cells[:size], prev, shift=shift[:size])
+            if np.array_equal(headlast, out[owner == size-1]):
+                rest = owner >= size
+                return np.concatenate((head, out[rest])), np.concatenate((headowner, owner[rest])), last
+            size *= 2
+        return self.mask(cells, prev, shift=shift)
+
+
+#Global deduplication of masked cells (M,2): each grid cell is kept once, in order of first occurrence.
+#Returns the unique cells and their multiplicity (number of times the cell was emitted)
+def dedup(cells):
+    index = grid.CellIndex(grid.cellKeys(cells))
+    return grid.keyCells(index.keys), index.counts
@@ -0,0 +1,144 @@
+#-------------------------------------------------------------------------------
+# Name:        Movement distribution
+# Purpose:     Movement vectors of a rasterized track, held as integer grid offsets
+#              (in units of the rounding increment m). The vector list, the set of
+#              unique vectors and their probabilities are built in one pass, so that
+#              movement probabilities become dictionary/array lookups.
+#              Used by crowding.py and crowdingRaster.py.
+#
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+import numpy as np
+from shapely.geometry import Point
+
+import gridTrack
+import trackArray
+
+
+#Turns a vector (shapely point or (x,y) pair) into its integer grid offset
+def gridOffset(v, m):
+    if isinstance(v, Point):
+        v = (v.x, v.y)
+    return (int(round(v[0]/m)), int(round(v[1]/m)))
+
+
+#Distribution of relative vectors (movements) in a track sequence.
+#offsets: (N-1,2) integer offsets between consecutive points, in track order (V)
+#keys:    (K,2) unique offsets in order of first occurrence (Vset)
+#counts/probs: number of occurrences / movement probability of each unique offset
+class MoveDistr(object):
+
+    def __init__(self, offsets, m):
+        self.m = m
+        self.offsets = np.asarray(offsets, dtype=np.int64).reshape(-1, 2)
+        if len(self.offsets):
+            keys, first, counts = np.unique(self.offsets, axis=0, return_index=True, return_counts=True)
+            order = np.argsort(first)
+            self.keys = keys[order]
+            self.counts = counts[order]
+        else:
+            self.keys = np.zeros((0, 2), dtype=np.int64)
+            self.counts = np.zeros(0, dtype=np.int64)
+        self.index = {k: i for i, k in enumerate(map(tuple, self.keys.tolist()))}
+        self.probs = self.counts/float(max(len(self.offsets), 1))
+
+    @classmethod
+    def fromTrack(cls, track, m):
+        if isinstance(track, gridTrack.GridTrack) and track.m == m:
+            return cls(track.offsets(), m)
+        xy = trackArray.coords(track)
+        return cls(np.rint(np.diff(xy, axis=0)/m), m)
+
+    def __len__(self):
+        return len(self.keys)
+
+    #Unique vectors in coordinate units
+    @property
+    def vectors(self):
+        return self.keys*float(self.m)
+
+    #Position of each offset in keys, -1 if the offset does not occur
+    def lookup(self, offsets):
+        return np.array([self.index.get(k, -1) for k in map(tuple, np.asarray(offsets).reshape(-1, 2).tolist())], dtype=np.int64)
+
+    #Movement probabilities of a set of offsets (0 for offsets that do not occur)
+    def probsOf(self, offsets):
+        ind = self.lookup(offsets)
+        return np.where(ind >= 0, self.probs[ind], 0.0)
+
+    #Movement probability of a single vector
+    def prob(self, v):
+        i = self.index.get(gridOffset(v, self.m), -1)
+        return float(self.probs[i]) if i >= 0 else 0.0
+
+    #The vector list and unique vector set as shapely points
+    def V(self):
+        return [Point(v) for v in self.offsets*float(self.m)]
+
+    def Vset(self):
+        return [Point(v) for v in self.vectors]
+
+
+#Walker's alias table over fixed probabilities: draws in O(1) after O(K) setup
+class AliasTable(object):
+
+    def __init__(self, probs):
+        probs = np.asarray(probs, dtype=np.float64)
+        n = len(probs)
+        scaled = probs*n/probs.sum()
+        self.prob = np.ones(n)
+        self.alias = np.arange(n)
+        small = [i for i in range(n) if scaled[i] < 1.0]
+        large = [i for i in range(n) if scaled[i] >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] += scaled[s] - 1.0
+            (small if scaled[l] < 1.0 else large).append(l)
+
+    def __len__(self):
+        return len(self.prob)
+
+    def draw(self, size=None, rng=np.random):
+        i = rng.randint(0, len(self.prob), size)
+        return np.where(rng.random_sample(size) < self.prob[i], i, self.alias[i])
+
+
+#Sampler for the unique vectors of a movement distribution. The static movement probabilities are drawn from an alias
+#table and combined with per-step location weights by rejection, so a draw is O(1) in the usual case.
+class MoveSampler(object):
+
+    def __init__(self, distr):
+        self.distr = distr
+        self.table = AliasTable(distr.probs) if len(distr) else None
+
+    #Yields distinct vector indices (without replacement) with probability proportional to movement probability times
+    #weights. Vectors with zero weight are never drawn; if all weights are zero, the movement probabilities alone are used.
+    def candidates(self, weights=None, rng=np.random, batch=8):
+        n = len(self.distr)
+        w = np.ones(n) if weights is None else np.asarray(weights, dtype=np.float64)
+        if not (w > 0).any():
+            w = np.ones(n)
+        w = w/w.max()
+        drawn = np.zeros(n, dtype=bool)
+        remaining = int(((w > 0) & (self.distr.probs > 0)).sum())
+        tries = 0
+        while remaining and tries < 4*n:
+            ks, us = self.table.draw(batch, rng), rng.random_sample(batch)
+            tries += batch
+            for k, u in zip(ks, us):
+                if not drawn[k] and u < w[k]:
+                    drawn[k] = True
+                    remaining -= 1
+                    yield k
+                    if not remaining:
+                        return
+        #Too many rejections: order the remaining vectors at once (weighted sampling without replacement)
+        pw = self.distr.probs*w
+        pw[drawn] = 0.0
+        left = np.nonzero(pw > 0)[0]
+        keys = rng.random_sample(len(left))**(1.0/pw[left])
+        for k in left[np.argsort(-keys)]:
+            yield k
@@ -24,6 +24,10 @@ from scipy.spatial import Voronoi
 from pathlib import Path
 import matplotlib.pyplot as plt
 
+import layers
+import reproject
+import trackArray
+
 
 # Find K nearest neighbors at each of the track points
 def knn(pArray, k):
@@ -64,7 +68,7 @@ def plotDensity(xmin, xmax, ymin, ymax, cluster, density, positions, X):
     
 # Gaussian perturbation
 def GaussianPb(track, k):
-    pArray = np.array([[pt.x, pt.y] for ind, pt in np.ndenumerate(track.values)])
+    pArray = trackArray.coords(track)
     distances, indices = knn(pArray, k)
     #Weighted track perturbation based upon Gaussian as weights
     pbTrack = []
@@ -74,7 +78,7 @@ def GaussianPb(track, k):
         relocated = relocate(cluster)
         pbTrack.append(relocated.T)
     pbTrack = np.array(pbTrack)
-    pbTrack = GeoSeries(map(Point, pbTrack))
+    pbTrack = trackArray.like(pbTrack, track)
     return pbTrack
 
 
@@ -86,49 +90,48 @@ def vorSnap(lines, p):
         if p.distance(line)<dist:
             closestP = line.interpolate(line.project(p))
             dist = p.distance(line)  
-    return np.array(closestP)
+    return np.array(closestP.coords[0])
     
 
-def VorMask(track):
-    pArray = np.array([[pt.x, pt.y] for ind, pt in np.ndenumerate(track.values)])
+def VorMask(track, sink=None):
+    pArray = trackArray.coords(track)
     vor = Voronoi(pArray)
     lines = [LineString(vor.vertices[line]) for line in vor.ridge_vertices if -1 not in line]
     
-    #Save the Voronoi polygons in shp
-    voronoi = [poly for poly in shapely.ops.polygonize(lines)]
-    schemaVor = {'geometry': 'Polygon','properties': {'Id':'int:5'},}
-    with fiona.open("vor.shp", "w", driver='ESRI Shapefile', crs=from_epsg(28992), schema=schemaVor) as output:
-        for v in voronoi:
-            output.write({'geometry': mapping(v), 'properties': {'Id':voronoi.index(v)}})
+    #Save the Voronoi polygons in the sink
+    if sink is not None:
+        voronoi = [poly for poly in shapely.ops.polygonize(lines)]
+        vorgdf = gpd.GeoDataFrame({'Id': np.arange(len(voronoi))}, geometry=voronoi, crs='epsg:28992')
+        layers.writeLayer(vorgdf, 'vor', sink)
     
     vorTrack = []
     for i in range(len(pArray)):
         p = pArray[i]
         p = Point(p)
         vorTrack.append(vorSnap(lines, p))          
-    vorTrack = GeoSeries(map(Point, np.array(vorTrack)))
+    vorTrack = trackArray.like(np.array(vorTrack), track)
     return vorTrack
         
 
-def run(f):
+#Masks the track in the csv file f with Gaussian perturbation and Voronoi masking.
+#Returns the original and masked tracks as in-memory layers, saved in the sink if given (see layers.py)
+def run(f, sink=None):
 
     df = pd.read_csv(f)
-    track = df[['X','Y']]    
+    track = df[reproject.xyColumns(df)]    
 
-    track['points'] = list(zip(track.X, track.Y))
-    track['points']  = track['points'].apply(Point)
-    trackgdf = gpd.GeoDataFrame(track, geometry='points')
-    trackgdf.crs = {"init": 'epsg:4326'}
-    trackgdf = trackgdf.to_crs({"init": 'epsg:28992'})
+    trackgdf = reproject.rdFrame(track)
     # Alternative: filename = str(f).split('.')[0][10:]+'orig.shp'
-    trackgdf.to_file(driver = 'ESRI Shapefile', filename = 'orig.shp')
+    layers.writeLayer(trackgdf, 'orig', sink)
     
     k = 6
     pbTrack = GaussianPb(trackgdf['points'], k)
-    pbTrack.to_file(driver = 'ESRI Shapefile', filename = 'Gaussian.shp')
+    layers.writeLayer(pbTrack, 'Gaussian', sink)
     
-    vorTrack = VorMask(trackgdf['points'])
-    vorTrack.to_file(driver = 'ESRI Shapefile', filename = 'Vor.shp')
+    vorTrack = VorMask(trackgdf['points'], sink)
+    layers.writeLayer(vorTrack, 'Vor', sink)
+
+    return {'orig': trackgdf, 'Gaussian': pbTrack, 'Vor': vorTrack}
 
     
 
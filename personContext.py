@@ -0,0 +1,116 @@
+#-------------------------------------------------------------------------------
+# Name:        Person context
+# Purpose:     Crowding state shared by the tracks of one person (the person column of
+#              the track csv files; dataSelection.homeTrack extracts several home tracks
+#              per person). The context pools the movement vectors and the land use
+#              corridor of the person's tracks, and prepares the crowding state of each
+#              track (parameters, rasterized cells, movement distribution, land use table)
+#              with one corridor read. With pooled, extensions are drawn from the pooled
+#              movement profile and land use distribution of the person; once warmup
+#              tracks are pooled, the pool is frozen and later tracks skip the corridor:
+#                  context = PersonContext('landUse.tif', pooled=True)
+#                  home, crowded = crowdingRaster.Crowd(track, land, numHome, context=context)
+#
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+import numpy as np
+
+import corridor
+import crowdingRaster
+import grid
+import landUseRaster
+import movement
+import reproject
+import trackArray
+
+
+#Without pooled (the default), every track is crowded as crowdingRaster.Crowd crowds it, with its own crowding parameters,
+#rasterized cells, movement distribution and land use table. These depend on the track itself (the rounding increment m
+#differs per track), so prepare computes them per track and the context saves one rasterization and one corridor read per
+#track only; the pooled profile is kept along for later use. Setup shared across the tracks of the person (the pooled
+#movement distribution and land use table, skipping the corridor once warm) is only used with pooled
+class PersonContext(object):
+
+    #land:    land use raster; k, lag as in crowdingRaster.Crowd
+    #pooled:  extend tracks with the pooled movement profile and land use distribution of the person
+    #warmup:  number of tracks after which the pool is frozen (None: all tracks are pooled)
+    def __init__(self, land, k=10, lag=50, pooled=False, warmup=None):
+        self.land = landUseRaster.loadGrid(land)
+        self.k = k
+        self.lag = lag
+        self.pooled = pooled
+        self.warmup = warmup
+        self.tracks = 0
+        #Movement vectors of the person in metres (offsets times the rounding increment of their track) -> count
+        self.moves = {}
+        #Land use pixel counts within the union of the corridors of the person's tracks
+        self.corridor = corridor.CorridorCounts(self.land, lag)
+        self._distrs = {}
+
+    @property
+    def warm(self):
+        return self.warmup is not None and self.tracks >= self.warmup
+
+    #Pooled land use distribution (class -> probability)
+    def table(self):
+        return self.corridor.probs()
+
+    #Pooled movement profile on the grid of rounding increment m
+    def distr(self, m):
+        if m not in self._distrs:
+            if self.moves:
+                vectors = np.array(list(self.moves.keys()), dtype=np.float64)
+                offsets = np.rint(vectors/m).astype(np.int64)
+                counts = np.array(list(self.moves.values()), dtype=np.int64)
+                #Vectors shorter than half a cell are no movements on this grid
+                keep = offsets.any(axis=1)
+                offsets = np.repeat(offsets[keep], counts[keep], axis=0)
+            else:
+                offsets = np.zeros((0, 2), dtype=np.int64)
+            self._distrs[m] = movement.MoveDistr(offsets, m)
+        return self._distrs[m]
+
+    #Adds a track (N,2, RD New) to the pool (unless it is frozen) and returns its crowding state: the parameters d, m, r,
+    #the rasterized cells with their lookup to the track points (grid.CellIndex, as Rasterize), and the movement
+    #distribution and land use table to extend it with (its own, or the pooled ones)
+    def prepare(self, xy):
+        xy = trackArray.coords(xy)
+        d, m, r = crowdingRaster.crowdParams(np.hypot(*np.diff(xy, axis=0).T), self.k)
+        index = grid.CellIndex(grid.cellKeys(grid.cells(xy, m)))
+        cells = grid.keyCells(index.keys)
+        offsets = np.diff(cells, axis=0)
+        state = {'d': d, 'm': m, 'r': r, 'cells': cells, 'lookup': index}
+        if self.pooled and self.warm:
+            state.update({'distr': self.distr(m), 'table': self.table()})
+            return state
+        #One corridor read for the table of the track and the pool
+        ids, values = corridor.corridorPixels(xy, self.land, self.lag)
+        if not self.warm:
+            for v, n in zip(*np.unique(offsets*m, axis=0, return_counts=True)):
+                v = tuple(v.tolist())
+                self.moves[v] = self.moves.get(v, 0) + int(n)
+            keep = np.array([i not in self.corridor.pixels for i in ids.tolist()], dtype=bool)
+            self.corridor.update(ids[keep], values[keep])
+            self._distrs = {}
+            self.tracks += 1
+        if self.pooled:
+            state.update({'distr': self.distr(m), 'table': self.table()})
+        else:
+            classes, counts = np.unique(values, return_counts=True)
+            state.update({'distr': movement.MoveDistr(offsets, m),
+                          'table': {c: n/float(len(values)) for c, n in zip(classes.tolist(), counts.tolist())}})
+        return state
+
+
+#Crowds the tracks of a data frame of track points (person, track, X, Y and purpose columns, e.g. the csv files of
+#dataSelection) with one context per person. Yields person, track, home and the layers of crowdingRaster.Crowd
+def crowdPersons(df, land, k=10, p = 0.02, lag=50, pooled=False, warmup=None, **kwargs):
+    for person, persondf in df.groupby('person', sort=False):
+        context = PersonContext(land, k, lag, pooled, warmup)
+        for track, trackdf in persondf.groupby('track', sort=False):
+            numHome = int((trackdf['purpose'] == 'home').sum()) if 'purpose' in trackdf.columns else 0
+            #RDX/RDY columns, if present, are used as they are (see reproject.rdCoords)
+            home, crowded = crowdingRaster.Crowd(trackdf[reproject.xyColumns(trackdf)], land, numHome, k=k, p=p, lag=lag,
+                                                 context=context, **kwargs)
+            yield person, track, home, crowded
@@ -0,0 +1,83 @@
+#-------------------------------------------------------------------------------
+# Name:        Reprojection
+# Purpose:     Projecting raw track coordinates from WGS84 to RD New (EPSG:28992) with a
+#              cached pyproj Transformer, for single tracks or for many tracks in one
+#              vectorized call. Projected coordinates can be stored with the source data
+#              (columns RDX/RDY), so a batch run projects each track only once.
+#
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+import functools
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import pyproj
+
+
+WGS84 = 'epsg:4326'
+RD = 'epsg:28992'
+#Columns of stored RD New coordinates in track data frames/csv files
+RDCOLUMNS = ('RDX', 'RDY')
+
+
+#Transformer between two CRS (x/y in lon/lat order), created once per CRS pair
+@functools.lru_cache(maxsize=None)
+def transformer(src=WGS84, dst=RD):
+    return pyproj.Transformer.from_crs(src, dst, always_xy=True)
+
+
+#Projects an (N,2) coordinate array
+def project(xy, src=WGS84, dst=RD):
+    xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+    x, y = transformer(src, dst).transform(xy[:, 0], xy[:, 1])
+    return np.column_stack((x, y))
+
+
+#Projects the coordinate arrays of many tracks in one call. Returns a list of projected (N_i,2) arrays
+def projectMany(tracks, src=WGS84, dst=RD):
+    tracks = [np.asarray(xy, dtype=np.float64).reshape(-1, 2) for xy in tracks]
+    if not tracks:
+        return []
+    offsets = np.cumsum([len(xy) for xy in tracks])[:-1]
+    return np.split(project(np.concatenate(tracks), src, dst), offsets)
+
+
+#Stores the RD New coordinates of many track data frames (X/Y in WGS84) in the columns RDX/RDY, projected in one call
+def projectFrames(frames, x='X', y='Y', src=WGS84):
+    projected = projectMany([np.column_stack((df[x].values, df[y].values)) for df in frames], src, RD)
+    for df, xy in zip(frames, projected):
+        df[RDCOLUMNS[0]] = xy[:, 0]
+        df[RDCOLUMNS[1]] = xy[:, 1]
+    return frames
+
+
+#Adds RDX/RDY columns to track csv files (written to outdir, or in place)
+def projectFiles(files, outdir=None, x='X', y='Y', src=WGS84):
+    files = [Path(f) for f in files]
+    frames = projectFrames([pd.read_csv(f) for f in files], x, y, src)
+    for f, df in zip(files, frames):
+        out = Path(outdir) / f.name if outdir is not None else f
+        df.to_csv(out, index=False)
+    return frames
+
+
+#Coordinate columns of a track data frame (X/Y and the stored RD New coordinates if present)
+def xyColumns(df, x='X', y='Y'):
+    return [x, y] + [c for c in RDCOLUMNS if c in df.columns]
+
+
+#RD New coordinates of a track data frame, from the stored RDX/RDY columns if present
+def rdCoords(df, x='X', y='Y', src=WGS84):
+    if all(c in df.columns for c in RDCOLUMNS):
+        return np.column_stack((df[RDCOLUMNS[0]].values, df[RDCOLUMNS[1]].values)).astype(np.float64)
+    return project(np.column_stack((df[x].values, df[y].values)), src, RD)
+
+
+#Track data frame (X/Y in WGS84) as a GeoDataFrame of points in RD New, with the point geometry in column geometry
+def rdFrame(df, x='X', y='Y', src=WGS84, geometry='points'):
+    xy = rdCoords(df, x, y, src)
+    gdf = gpd.GeoDataFrame(df.copy(), geometry=gpd.points_from_xy(xy[:, 0], xy[:, 1]), crs=RD)
+    return gdf.rename_geometry(geometry) if geometry != 'geometry' else gdf
@@ -15,17 +15,18 @@ import dataSelection
 dataSelection.main()
 
 from pathlib import Path
+import functools
 import numpy as np
-import otherMasking
-import crowdingRaster
-import attackRaster
-import evaluationReconstruct
-import evaluationExposure
+import batchCrowding
+import segmentedCrowding
 import os
 import pandas as pd
 
 repo_dir = Path('__file__').parents[0]
 data_dir = repo_dir / 'Extracted'
+#Tracks are processed one by one here; to use all cores: python batchCrowding.py Extracted landUse.tif no2small.tif
+#Long (multi-day) tracks of more than 5000 points are crowded in segments, in parallel on all cores
+crowd = functools.partial(segmentedCrowding.run, window=5000)
 
 i = 1
 reconstructC=[]
@@ -37,63 +38,17 @@ preserveV=[]
 for f in Path(data_dir).glob('*.csv'):
     print('working on track '+ str(f) + ' and is the number ' + str(i) + ' out of the total !')
     try: 
-        otherMasking.run(f)
-        home, speed = crowdingRaster.run(f)
-        
-        #Crowding on original track
-        potentialHome = attackRaster.attacking(fake='faketrack.shp')
-        #Reconstruction
-        originaltrack = 'track.shp'
-        predictedtrack = 'attacked.shp'
-        reconSummary = evaluationReconstruct.evalRecon(originaltrack, predictedtrack, home, potentialHome)
-        reconSummary = np.append(reconSummary, speed/reconSummary[0])
-        reconstructC.append(reconSummary.T)
-        #Preservation
-        originaltrack = 'track.shp'
-        faketrack = 'faketrack.shp'
-        concentration = 'no2small.tif'
-        preserveSummary = evaluationExposure.evalPres(originaltrack, faketrack, concentration)
-        preserveC.append(preserveSummary.T)
-
-        
-        #Other masking NO.1
-        potentialHome = attackRaster.attacking(fake='Gaussian.shp')
-        #Reconstruction
-        originaltrack = 'track.shp'
-        predictedtrack = 'attacked.shp'
-        reconSummary = evaluationReconstruct.evalRecon(originaltrack, predictedtrack, home, potentialHome)
-        reconSummary = np.append(reconSummary, speed/reconSummary[0])
-        reconstructG.append(reconSummary.T)
-        #Preservation
-        originaltrack = 'track.shp'
-        faketrack = 'Gaussian.shp'
-        concentration = 'no2small.tif'
-        preserveSummary = evaluationExposure.evalPres(originaltrack, faketrack, concentration)
-        preserveG.append(preserveSummary.T)
-        
-        #Other masking NO.2
-        potentialHome = attackRaster.attacking(fake='Vor.shp')
-        #Reconstruction
-        originaltrack = 'track.shp'
-        predictedtrack = 'attacked.shp'
-        reconSummary = evaluationReconstruct.evalRecon(originaltrack, predictedtrack, home, potentialHome)
-        reconSummary = np.append(reconSummary, speed/reconSummary[0])
-        reconstructV.append(reconSummary.T)
-        #Preservation
-        originaltrack = 'track.shp'
-        faketrack = 'Vor.shp'
-        concentration = 'no2small.tif'
-        preserveSummary = evaluationExposure.evalPres(originaltrack, faketrack, concentration)
-        preserveV.append(preserveSummary.T)
-        
-        os.remove('track.shp')
-        os.remove('faketrack.shp')
-        os.remove('attacked.shp')
-        os.remove('Gaussian.shp')
-        os.remove('Vor.shp')
+        summaries = batchCrowding.evaluateTrack(f, crowd=crowd)
+        reconstructC.append(summaries['C'][0])
+        preserveC.append(summaries['C'][1])
+        reconstructG.append(summaries['G'][0])
+        preserveG.append(summaries['G'][1])
+        reconstructV.append(summaries['V'][0])
+        preserveV.append(summaries['V'][1])
         
         i+=1
-    except:
+    except Exception as e:
+        print('track '+str(f)+' failed: '+repr(e))
         continue
 
 df_preC = pd.DataFrame(columns=['min', 'max', 'median', 'mean'], data = preserveC)
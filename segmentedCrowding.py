@@ -0,0 +1,154 @@
+#-------------------------------------------------------------------------------
+# Name:        Segmented crowding
+# Purpose:     Simulated crowding of very long (multi-day) tracks in segments. The track
+#              is split at trip boundaries (tripnr/stagenr), at time gaps and into windows
+#              of at most window points. The rounding increment, the rasterized track, its
+#              movement distribution and its land use table are computed once for the
+#              whole track, so all segments share one grid; the segments are then masked
+#              in parallel (process pool, land use raster in shared memory) and only the
+#              last segment, at the true end of the track, is extended with fake points
+#              (continuing the last window cells of the rasterized track).
+#              The outputs are stitched in track order, continuing the masking chain across
+#              the seams between segments (as masking the whole track would), and are shaped
+#              as those of crowdingRaster.Crowd:
+#                  home, crowded = crowdSegmented(df, 'landUse.tif', window=5000)
+#
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+import functools
+import time
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+
+import batchCrowding
+import crowdingRaster
+import extension
+import grid
+import landUseRaster
+import layers
+import masking
+import movement
+import reproject
+
+
+#Columns of the track csv files whose changes mark a new trip or stage
+TRIPCOLUMNS = ('tripnr', 'stagenr')
+
+
+#Splits a track (data frame of the track csv files) into segments: at changes of tripnr/stagenr, at time gaps of more
+#than gap seconds (datetime column) and into windows of at most window points. Returns the offsets (S+1,) of the segments
+def segmentOffsets(df, window=5000, gap=None):
+    n = len(df)
+    cut = np.zeros(n, dtype=bool)
+    for column in TRIPCOLUMNS:
+        if column in df.columns:
+            values = df[column].values
+            cut[1:] |= ~((values[1:] == values[:-1]) | (pd.isnull(values[1:]) & pd.isnull(values[:-1])))
+    if gap is not None and 'datetime' in df.columns:
+        seconds = pd.to_datetime(df['datetime']).values.astype('datetime64[ns]').astype(np.int64)/1e9
+        cut[1:] |= np.diff(seconds) > gap
+    cut[:1] = n > 0
+    starts = np.nonzero(cut)[0]
+    ends = np.append(starts[1:], n)
+    offsets = [0]
+    for start, end in zip(starts, ends):
+        offsets.extend(range(start + window, end, window) if window else [])
+        offsets.append(end)
+    return np.array(offsets if n else [0], dtype=np.int64)
+
+
+#Masks the cells of one segment. The last segment is extended first (ExtendMimic) from tail, the end of the rasterized
+#track (None for other segments). Returns the fake cells of the segment (its cells, extended if last), the masked cells,
+#their owners and the template shifts (to continue the mask of the previous segment, see TemplateMasker.resume) and the
+#extension report (None if not extended)
+def _crowdSegment(segment, land, distr, table, p, lag, m, r, gate=False, budget=None):
+    cells, tail = segment
+    report = None
+    if tail is not None and len(tail) > 1:
+        budget = budget if budget is not None else extension.Budget()
+        fakecells = crowdingRaster.mimicCells(tail, distr, landUseRaster.loadGrid(land), table, p, lag, m, gate, budget)
+        cells = np.vstack((cells, fakecells[len(tail):]))
+        report = budget.report()
+    masker = masking.TemplateMasker(r)
+    shift = masker.shifts(len(cells))
+    out, owner, last = masker.mask(cells, shift=shift)
+    return cells, (out, owner, shift), report
+
+
+#Crowds a long track (data frame of the track csv files, coordinates in crs) in segments (see segmentOffsets).
+#workers: processes for the segments (1: in this process). Returns home and the layers of crowdingRaster.Crowd;
+#faketrack.attrs holds the extension report and the offsets of the segments in the rasterized track
+def crowdSegmented(df, land, numHome=0, k=10, p = 0.02, lag=50, window=5000, gap=None, workers=None, crs=reproject.WGS84,
+                   dedup=False, sink=None, gate=False, budget=None):
+    offsets = segmentOffsets(df, window, gap)
+    xy = reproject.rdCoords(df, src=crs) if crs != reproject.RD else df[['X', 'Y']].values.astype(np.float64)
+    trackgdf = gpd.GeoDataFrame({'points': gpd.points_from_xy(xy[:,0], xy[:,1])}, geometry='points', crs=reproject.RD)
+    layers.writeLayer(trackgdf, 'track', sink)
+
+    #Crowding parameters, rasterized track, movement distribution and land use table of the whole track.
+    #Steps between segments (e.g. from the end of one trip to the start of the next) are no movements
+    steps = np.hypot(*np.diff(xy, axis=0).T)
+    d, m, r = crowdingRaster.crowdParams(np.delete(steps, offsets[1:-1]-1) if len(steps) > len(offsets)-2 else steps, k)
+    home = xy[-numHome:].mean(axis=0) if numHome else np.zeros((2,))
+    index = grid.CellIndex(grid.cellKeys(grid.cells(xy, m)))
+    cells = grid.keyCells(index.keys)
+    rastertrack = gpd.GeoSeries(gpd.points_from_xy(cells[:,0]*float(m), cells[:,1]*float(m)), name='geom')
+    layers.writeLayer(rastertrack, 'rastertrack', sink)
+
+    #Segments of the rasterized track: each cell belongs to the segment of the point where it first occurs
+    bounds = np.searchsorted(index.first, offsets)
+    bounds = np.unique(np.append(bounds[:-1], len(cells)))
+    distr = movement.MoveDistr(np.delete(np.diff(cells, axis=0), bounds[1:-1]-1, axis=0), m)
+    table = crowdingRaster.locTable(xy, land, lag)
+    #The extension continues the last window cells of the rasterized track (its number of fake points is bounded by the window)
+    tail = cells[-window:] if window else cells
+    segments = [(cells[a:b], tail if b == len(cells) else None) for a, b in zip(bounds[:-1], bounds[1:])]
+    work = functools.partial(_crowdSegment, land=land, distr=distr, table=table, p=p, lag=lag, m=m, r=r, gate=gate, budget=budget)
+    if workers == 1 or len(segments) < 2:
+        results = [work(segment) for segment in segments]
+    else:
+        path = land.path if isinstance(land, landUseRaster.RasterGrid) else land
+        #Every segment is masked with its own random stream, seeded from the random state of this process
+        results = batchCrowding.batch(segments, work, rasters=(path,), workers=workers, seed=np.random.randint(2**31))
+        failed = [i for i, (segment, result) in enumerate(results) if result is None]
+        if failed:
+            raise RuntimeError('segments '+str(failed)+' of the track failed')
+        results = [result for segment, result in results]
+
+    #Stitch the segments in track order (all on the grid of m); each segment continues the last mask of the previous one
+    fakecells = np.concatenate([fake for fake, masked, report in results])
+    faketrack = gpd.GeoSeries(gpd.points_from_xy(fakecells[:,0]*float(m), fakecells[:,1]*float(m)))
+    faketrack.attrs['extension'] = results[-1][2]
+    faketrack.attrs['segments'] = bounds
+    layers.writeLayer(faketrack, 'faketrack', sink)
+    masker = masking.TemplateMasker(r)
+    outs, prev = [], None
+    for fake, (out, owner, shift), report in results:
+        out, owner, prev = masker.resume(fake, out, owner, shift, prev)
+        outs.append(out)
+    out = np.concatenate(outs)
+    print(str(len(out))+" masked points from originally "+str(len(fakecells))+" in "+str(len(segments))+" segments")
+    if dedup:
+        out, counts = masking.dedup(out)
+    maskedtrack = gpd.GeoSeries(gpd.points_from_xy(out[:,0]*float(m), out[:,1]*float(m)), name='points')
+    if dedup:
+        maskedtrack = gpd.GeoDataFrame({'points': maskedtrack, 'count': counts}, geometry='points')
+    layers.writeLayer(maskedtrack, 'maskedtrack', sink)
+
+    return home, {'track': trackgdf, 'rastertrack': rastertrack, 'faketrack': faketrack, 'maskedtrack': maskedtrack, 'lookup': index}
+
+
+#Segmented crowding of a track file, as crowdingRaster.run; tracks of at most window points are crowded as a whole
+def run(f, sink=None, land='landUse.tif', budget=None, window=5000, gap=None, workers=None):
+    df = pd.read_csv(f)
+    if window and len(df) <= window:
+        return crowdingRaster.run(f, sink=sink, land=land, budget=budget)
+    numHome = int((df['purpose'] == 'home').sum()) if 'purpose' in df.columns else 0
+    start = time.perf_counter()
+    home, crowded = crowdSegmented(df, land, numHome, k=10, p = 0.02, lag=50, window=window, gap=gap, workers=workers,
+                                   sink=sink, budget=budget)
+    speed = time.perf_counter()-start
+    return home, speed, crowded
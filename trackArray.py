@@ -0,0 +1,133 @@
+#-------------------------------------------------------------------------------
+# Name:        Track arrays
+# Purpose:     A lightweight track type backed by a contiguous float64 (N,2) coordinate
+#              array with optional attribute columns (timestamp, accuracy, purpose).
+#              Converts to and from geopandas GeoSeries lazily, so that functions
+#              working on coordinates do not need to create shapely points.
+#
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+from geopandas import GeoSeries
+import pyproj
+
+import grid
+import gridTrack
+import reproject
+
+
+#Attribute columns taken over from the track csv files (column in csv -> column in Track)
+ATTRIBUTES = {'datetime': 'timestamp', 'accuracy': 'accuracy', 'purpose': 'purpose'}
+
+
+class Track(object):
+
+    def __init__(self, xy, crs='epsg:28992', **attrs):
+        self.xy = np.ascontiguousarray(xy, dtype=np.float64).reshape(-1, 2)
+        self.crs = crs
+        self.attrs = {}
+        for name, values in attrs.items():
+            if values is not None:
+                values = np.asarray(values)
+                if len(values) != len(self.xy):
+                    raise ValueError('Attribute '+name+' has '+str(len(values))+' values for '+str(len(self.xy))+' points')
+                self.attrs[name] = values
+        self._geoseries = None
+
+    #Track from a data frame with X/Y columns (as in the track csv files, WGS84 by default)
+    @classmethod
+    def fromFrame(cls, df, x='X', y='Y', crs='epsg:4326'):
+        attrs = {}
+        for column, name in ATTRIBUTES.items():
+            if column in df.columns:
+                values = df[column].values
+                if name == 'timestamp':
+                    values = pd.to_datetime(values).values
+                attrs[name] = values
+        return cls(np.column_stack((df[x].values, df[y].values)), crs=crs, **attrs)
+
+    @classmethod
+    def fromGeoSeries(cls, gs, **attrs):
+        crs = gs.crs.to_string() if gs.crs is not None else None
+        track = cls(coords(gs), crs=crs, **attrs)
+        track._geoseries = gs
+        return track
+
+    #Track projected to another CRS (with the cached transformer of reproject.py)
+    def project(self, crs=reproject.RD):
+        if self.crs is None or pyproj.CRS(self.crs) == pyproj.CRS(crs):
+            return Track(self.xy, crs=crs if self.crs is not None else None, **self.attrs)
+        return Track(reproject.project(self.xy, self.crs, crs), crs=crs, **self.attrs)
+
+    def __len__(self):
+        return len(self.xy)
+
+    def __getitem__(self, ind):
+        return Track(self.xy[ind], crs=self.crs, **{name: values[ind] for name, values in self.attrs.items()})
+
+    def __getattr__(self, name):
+        attrs = self.__dict__.get('attrs', {})
+        if name in attrs:
+            return attrs[name]
+        raise AttributeError(name)
+
+    @property
+    def size(self):
+        return len(self.xy)
+
+    @property
+    def x(self):
+        return self.xy[:, 0]
+
+    @property
+    def y(self):
+        return self.xy[:, 1]
+
+    #Point geometries of the track, created on first use
+    def toGeoSeries(self):
+        if self._geoseries is None:
+            self._geoseries = GeoSeries(gpd.points_from_xy(self.xy[:, 0], self.xy[:, 1]), crs=self.crs)
+        return self._geoseries
+
+    def toGeoDataFrame(self, geometry='geometry'):
+        gdf = gpd.GeoDataFrame(self.attrs, geometry=self.toGeoSeries().values, crs=self.crs)
+        return gdf.rename_geometry(geometry) if geometry != 'geometry' else gdf
+
+
+#Returns the coordinates of a track (Track, gridTrack.GridTrack, GeoSeries/sequence of points or coordinate array)
+#as an (N,2) float array
+def coords(track):
+    if isinstance(track, (Track, gridTrack.GridTrack)):
+        return track.xy
+    if isinstance(track, np.ndarray):
+        return np.asarray(track, dtype=np.float64).reshape(-1, 2)
+    if isinstance(track, gpd.GeoDataFrame):
+        track = track.geometry
+    if isinstance(track, GeoSeries):
+        return np.column_stack((track.x.values, track.y.values))
+    return np.array([[pt.x, pt.y] for pt in track], dtype=np.float64).reshape(-1, 2)
+
+
+#Integer cells of a track on the grid of m (taken as they are from grid tracks of the same grid)
+def cells(track, m):
+    if isinstance(track, gridTrack.GridTrack) and track.m == m:
+        return track.cells
+    return grid.cells(coords(track), m)
+
+
+#Wraps a coordinate array into the same kind of track as the input (Track or GeoSeries)
+def like(xy, track):
+    if isinstance(track, Track):
+        return Track(xy, crs=track.crs)
+    xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+    return GeoSeries(gpd.points_from_xy(xy[:, 0], xy[:, 1]))
+
+
+#Returns a track as a GeoSeries of points
+def toGeoSeries(track):
+    if isinstance(track, (Track, gridTrack.GridTrack)):
+        return track.toGeoSeries()
+    return track
@@ -0,0 +1,99 @@
+#-------------------------------------------------------------------------------
+# Name:        Incremental track similarity
+# Purpose:     Similarity gate for extending a track with fake points. Keeps running
+#              movement counts and land use pixel counts (of the corridor of radius lag
+#              along the track) for the fake track, updated per appended point from
+#              the new segment only, so that the similarity to the original track
+#              (sum of the chi square p-values of movement and land use, as in
+#              similarity() of crowdingRaster.py) is cheap to test for each candidate.
+#
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+import numpy as np
+from scipy import stats
+
+import corridor
+import grid
+
+
+#Chi square p-value of a contingency table of two distributions (rows where both are zero are left out)
+def chi2PValue(observed, reference):
+    table = np.column_stack((observed, reference))
+    table = table[table.sum(axis=1) > 0]
+    if len(table) < 2:
+        return 1.0
+    chi2_stat, p_val, dof, ex = stats.chi2_contingency(table)
+    return p_val
+
+
+#Accepts candidate points for a track of integer cells if the extended track stays similar to the original:
+#moveSim + locSim > p. distr is the movement distribution of the original (rasterized) track, table its land use
+#distribution (class -> probability), land the land use grid (landUseRaster.LandUseGrid)
+class SimilarityGate(object):
+
+    def __init__(self, cells, distr, land, table, lag, p):
+        cells = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+        self.distr = distr
+        self.land = land
+        self.lag = lag
+        self.p = p
+        self.classes = list(table.keys())
+        self.reference = np.array([table[c] for c in self.classes], dtype=np.float64)
+        self.classindex = {c: i for i, c in enumerate(self.classes)}
+        #Movement counts of the fake track over the unique vectors of distr (other vectors are counted in 'other')
+        self.movecounts = np.zeros(len(distr.probs) + 1, dtype=np.float64)
+        self.movecounts[:-1] = distr.counts
+        #Land use pixel counts within the corridor of the fake track (in the order of the classes of table)
+        self.corridor = corridor.CorridorCounts(land, lag)
+        ids, values = self.corridor.new(cells*float(distr.m))
+        self.corridor.update(ids, values)
+        self.landcounts = np.zeros(len(self.classes) + 1, dtype=np.float64)
+        self._addClasses(self.landcounts, values)
+        self._pending = None
+
+    def _addClasses(self, counts, values):
+        classes, n = np.unique(values, return_counts=True)
+        for c, k in zip(classes.tolist(), n.tolist()):
+            counts[self.classindex.get(c, len(self.classes))] += k
+
+    #Changes of the counts if the segment from cell end to cell were appended
+    def _delta(self, end, cell):
+        key = (int(grid.cellKeys(end)[0]), int(grid.cellKeys(cell)[0]))
+        if self._pending is not None and self._pending[0] == key:
+            return self._pending[1]
+        v = self.distr.index.get(tuple((np.asarray(cell) - np.asarray(end)).tolist()), len(self.distr.probs))
+        ids, values = self.corridor.new(np.array([end, cell])*float(self.distr.m))
+        landdelta = np.zeros_like(self.landcounts)
+        self._addClasses(landdelta, values)
+        delta = (v, ids, values, landdelta)
+        self._pending = (key, delta)
+        return delta
+
+    #Movement and land use similarity of the fake track to the original track, with counts movecounts/landcounts
+    def similarity(self, movecounts=None, landcounts=None):
+        movecounts = self.movecounts if movecounts is None else movecounts
+        landcounts = self.landcounts if landcounts is None else landcounts
+        #Observed distributions as probabilities (as moveSim and locSim compare probability tables)
+        moveobs = movecounts[:-1]/max(movecounts.sum(), 1.0)
+        moveSim = chi2PValue(moveobs[moveobs > 0], self.distr.probs[moveobs > 0])
+        locSim = chi2PValue(landcounts[:-1]/max(landcounts.sum(), 1.0), self.reference)
+        return moveSim + locSim
+
+    #Similarity of the fake track with the segment from cell end to cell appended (the counts are not changed)
+    def test(self, end, cell):
+        v, ids, values, landdelta = self._delta(end, cell)
+        movecounts = self.movecounts.copy()
+        movecounts[v] += 1
+        return self.similarity(movecounts, self.landcounts + landdelta)
+
+    def accepts(self, end, cell):
+        return self.test(end, cell) > self.p
+
+    #Appends the segment from cell end to cell to the counts
+    def append(self, end, cell):
+        v, ids, values, landdelta = self._delta(end, cell)
+        self.movecounts[v] += 1
+        self.landcounts += landdelta
+        self.corridor.update(ids, values)
+        self._pending = None